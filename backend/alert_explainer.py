@@ -0,0 +1,426 @@
+"""
+PathGreen-AI: Alert Explainer
+
+Background explanations for fleet alerts.
+
+Alerts are queued from the broadcast loop and immediately get a templated
+explanation built from the parsed regulation tables. A worker waits a short
+window so an alert storm lands in one batch, groups the batch by alert type
+and regulation section, and asks the LLM to explain each group in a single
+background-priority call. Explanations are cached by alert id, so "why is
+TRK-102 flagged?" is a cache read instead of a fresh LLM call.
+
+LLM text is also kept per condition (vehicle, alert type, severity). A
+vehicle re-raising the same alert every tick reuses it, and a condition
+is only sent to the LLM when it has no explanation yet and none is
+pending, so an unchanged alert costs one call rather than one per window.
+"""
+
+import asyncio
+import logging
+import re
+import time
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Iterable, Optional
+
+from chat_cache import mentioned_vehicle_ids
+from fleet_context import ALERT_STATUSES
+from llm_gateway import PRIORITY_BACKGROUND, LLMDegraded
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+DEFAULT_BATCH_WINDOW = 2.0  # seconds to wait for the rest of a storm
+DEFAULT_MAX_BATCH = 25  # alerts per LLM call
+DEFAULT_MAX_ENTRIES = 2000  # cached explanations
+DEFAULT_MAX_QUEUE = 1000  # alerts waiting for the worker
+DEFAULT_MAX_CONDITIONS = 1000  # (vehicle, type, severity) explanations kept
+
+# Alert type -> which regulation rule it is judged against
+ALERT_RULES = {
+    "HIGH_IDLE": "idle",
+    "EMISSION_SPIKE": "co2",
+    "HIGH_EMISSION": "co2",
+}
+
+ALERT_LABELS = {
+    "HIGH_IDLE": "extended idling",
+    "EMISSION_SPIKE": "an emission spike",
+    "HIGH_EMISSION": "high CO₂ emissions",
+}
+
+# Questions asking for the reason behind a vehicle's status
+_WHY_RE = re.compile(r"\b(why|explain\w*|reason|flagged|alert(ed|s)?|warning|critical)\b", re.IGNORECASE)
+
+# "<alert_id>: <explanation>" lines in the LLM reply (tolerates bullets/bold)
+_LINE_RE = re.compile(r"^[\s*\-•]*\**\[?([\w-]+)\]?\**\s*[:\-–—]\s*(.+)$")
+
+
+# =============================================================================
+# REGULATION BASIS
+# =============================================================================
+
+def regulation_basis(alert_type: str, regulations=None) -> tuple[str, str]:
+    """
+    The rule an alert type is judged against.
+
+    Args:
+        alert_type: Alert "type" (e.g. "HIGH_IDLE")
+        regulations: RegulationIndex with parsed limits (optional)
+
+    Returns:
+        (citation, rule summary); both empty if no rule is known
+    """
+    rule = ALERT_RULES.get(alert_type)
+    if regulations is None or rule is None:
+        return "", ""
+
+    if rule == "idle" and regulations.idle_limits:
+        limits = ", ".join(f"{zone} {seconds}s" for zone, (seconds, _) in regulations.idle_limits.items())
+        citation = next(iter(regulations.idle_limits.values()))[1]
+        return citation, f"Maximum continuous idle: {limits}."
+    if rule == "co2" and regulations.co2_limits:
+        limits = ", ".join(
+            f"{label} {values['unloaded']:.0f}/{values['loaded']:.0f} g/km"
+            for label, values in regulations.co2_limits.items()
+        )
+        citation = next(iter(regulations.co2_limits.values()))["citation"]
+        return citation, f"CO₂ limits (unloaded/loaded): {limits}."
+    return "", ""
+
+
+def template_explanation(alert: dict, rule: str) -> str:
+    """Deterministic explanation used until (or instead of) the LLM's."""
+    label = ALERT_LABELS.get(alert.get("type"), str(alert.get("type", "an alert")).replace("_", " ").lower())
+    text = f"{alert['vehicle_id']} was flagged {alert.get('severity', '?')} for {label}: {alert.get('message', '')}."
+    return f"{text} {rule}" if rule else text
+
+
+# =============================================================================
+# EXPLAINER
+# =============================================================================
+
+class AlertExplainer:
+    """
+    Batched, cached explanations for fleet alerts.
+
+    Call `submit()` with each tick's new alerts and run `run()` as a
+    background task. Lookups (`get`, `explain_query`) never wait on the LLM.
+
+    Args:
+        generate: Async prompt -> text function (None = templates only)
+        gateway: LLMGateway the batch calls are admitted through
+        regulations: RegulationIndex supplying rules and citations
+        batch_window: Seconds to collect alerts before a batch is sent
+        max_batch: Max alerts per LLM call
+        max_entries: Max cached explanations (oldest evicted)
+        max_queue: Max alerts waiting for the worker (oldest dropped)
+        max_conditions: Max per-condition LLM explanations kept for reuse
+    """
+
+    def __init__(
+        self,
+        generate: Optional[Callable[[str], Awaitable[str]]] = None,
+        gateway=None,
+        regulations=None,
+        batch_window: float = DEFAULT_BATCH_WINDOW,
+        max_batch: int = DEFAULT_MAX_BATCH,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+        max_conditions: int = DEFAULT_MAX_CONDITIONS,
+    ):
+        self.generate = generate
+        self.gateway = gateway
+        self.regulations = regulations
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.max_entries = max_entries
+        self.max_queue = max(1, max_queue)
+        self.max_conditions = max(1, max_conditions)
+
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+        self._latest: dict[str, str] = {}  # vehicle_id -> newest alert_id
+        self._queue: deque[str] = deque()
+        # (vehicle, type, severity) -> LLM explanation, least recently used first
+        self._conditions: OrderedDict[tuple, dict] = OrderedDict()
+        # condition queued or in flight -> alert ids waiting for its text
+        self._pending: dict[tuple, list[str]] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+
+        self.submitted = 0
+        self.reused = 0
+        self.dropped = 0
+        self.batches = 0
+        self.llm_calls = 0
+        self.llm_explained = 0
+        self.failures = 0
+        self.lookups = 0
+        self.lookup_hits = 0
+
+    # -------------------------------------------------------------------------
+    # Producer side (broadcast loop)
+    # -------------------------------------------------------------------------
+
+    def submit(self, alerts: Iterable[dict]):
+        """
+        Cache a templated explanation for each alert and queue it for the LLM.
+
+        Alerts without an "alert_id" are ignored.
+        """
+        for alert in alerts:
+            alert_id = alert.get("alert_id")
+            if not alert_id or alert_id in self._entries:
+                continue
+            citation, rule = regulation_basis(alert.get("type"), self.regulations)
+            self._entries[alert_id] = {
+                "alert_id": alert_id,
+                "vehicle_id": alert["vehicle_id"],
+                "type": alert.get("type"),
+                "severity": alert.get("severity"),
+                "message": alert.get("message", ""),
+                "timestamp": alert.get("timestamp"),
+                "explanation": template_explanation(alert, rule),
+                "citations": [citation] if citation else [],
+                "source": "template",
+            }
+            self._latest[alert["vehicle_id"]] = alert_id
+            self.submitted += 1
+            if self.generate is None:
+                continue
+
+            key = condition_key(self._entries[alert_id])
+            known = self._conditions.get(key)
+            if known is not None:
+                # Same vehicle, type and severity: reuse the LLM text
+                self._conditions.move_to_end(key)
+                self._apply(self._entries[alert_id], known)
+                self.reused += 1
+            elif key in self._pending:
+                self._pending[key].append(alert_id)
+            else:
+                if len(self._queue) >= self.max_queue:
+                    dropped = self._entries.get(self._queue.popleft())
+                    if dropped is not None:
+                        self._pending.pop(condition_key(dropped), None)
+                    self.dropped += 1
+                self._pending[key] = [alert_id]
+                self._queue.append(alert_id)
+
+        while len(self._entries) > self.max_entries:
+            old_id, old = self._entries.popitem(last=False)
+            if self._latest.get(old["vehicle_id"]) == old_id:
+                del self._latest[old["vehicle_id"]]
+
+        if self._queue and self._wakeup is not None:
+            self._wakeup.set()
+
+    # -------------------------------------------------------------------------
+    # Lookups
+    # -------------------------------------------------------------------------
+
+    def get(self, alert_id: str) -> Optional[dict]:
+        """Cached explanation for one alert."""
+        return self._entries.get(alert_id)
+
+    def latest_for(self, vehicle_id: str) -> Optional[dict]:
+        """Explanation for the newest alert raised by a vehicle."""
+        alert_id = self._latest.get(vehicle_id)
+        return self._entries.get(alert_id) if alert_id else None
+
+    def explain_query(self, query: str, vehicles: dict[str, dict]) -> Optional[dict]:
+        """
+        Answer "why is TRK-x flagged?" from the cache.
+
+        Only answers when every vehicle named in the question is currently
+        WARNING/CRITICAL and has a cached explanation; anything else falls
+        through to the LLM.
+
+        Args:
+            query: User question
+            vehicles: vehicle_id -> latest vehicle dict (for current status)
+
+        Returns:
+            {"text", "citations", "source"} or None
+        """
+        ids = mentioned_vehicle_ids(query)
+        if not ids or not _WHY_RE.search(query):
+            return None
+        self.lookups += 1
+
+        entries = []
+        for vid in ids:
+            vehicle = vehicles.get(vid)
+            entry = self.latest_for(vid)
+            if vehicle is None or vehicle.get("status") not in ALERT_STATUSES or entry is None:
+                return None
+            entries.append(entry)
+
+        self.lookup_hits += 1
+        text = "\n\n".join(f"**{e['vehicle_id']}** ({e['severity']} {e['type']}): {e['explanation']}" for e in entries)
+        citations = sorted({c for e in entries for c in e["citations"]})
+        return {"text": text, "citations": citations, "source": "alert_explanations"}
+
+    def stats(self) -> dict:
+        """Counters for /metrics."""
+        return {
+            "cached": len(self._entries),
+            "queued": len(self._queue),
+            "submitted": self.submitted,
+            "reused": self.reused,
+            "conditions": len(self._conditions),
+            "pending": len(self._pending),
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "llm_calls": self.llm_calls,
+            "llm_explained": self.llm_explained,
+            "alerts_per_call": round(self.llm_explained / self.llm_calls, 2) if self.llm_calls else 0.0,
+            "failures": self.failures,
+            "lookups": self.lookups,
+            "lookup_hits": self.lookup_hits,
+        }
+
+    # -------------------------------------------------------------------------
+    # Worker
+    # -------------------------------------------------------------------------
+
+    async def run(self):
+        """Background loop: batch queued alerts into LLM calls."""
+        self._wakeup = asyncio.Event()
+        if self._queue:
+            self._wakeup.set()
+        while True:
+            await self._wakeup.wait()
+            # Let the rest of an alert storm arrive before building the batch
+            await asyncio.sleep(self.batch_window)
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"[Explainer] Batch failed: {e}")
+
+    async def flush(self):
+        """Explain everything queued right now, one LLM call per group chunk."""
+        if self.generate is None:
+            self._queue.clear()
+            self._pending.clear()
+            return
+
+        # (type, citation) -> one queued alert per pending condition; repeats
+        # of a condition wait in _pending and get the same text
+        groups: dict[tuple[str, str], list[dict]] = {}
+        while self._queue:
+            entry = self._entries.get(self._queue.popleft())
+            if entry is None:
+                continue
+            citation = entry["citations"][0] if entry["citations"] else ""
+            groups.setdefault((entry["type"], citation), []).append(entry)
+        if not groups:
+            return
+
+        self.batches += 1
+        for (alert_type, citation), entries in groups.items():
+            for start in range(0, len(entries), self.max_batch):
+                await self._explain_group(alert_type, citation, entries[start:start + self.max_batch])
+
+    async def _explain_group(self, alert_type: str, citation: str, entries: list[dict]):
+        """
+        One LLM call for alerts sharing a type and regulation section.
+
+        Args:
+            entries: One alert per condition; each explanation is shared
+                with the condition's other waiting alerts and kept for reuse
+        """
+        keys = [condition_key(entry) for entry in entries]
+        try:
+            await self._request(alert_type, citation, entries)
+        finally:
+            # Unexplained conditions may be queued again by their next alert
+            for key in keys:
+                self._pending.pop(key, None)
+
+    async def _request(self, alert_type: str, citation: str, entries: list[dict]):
+        _, rule = regulation_basis(alert_type, self.regulations)
+        prompt = build_batch_prompt(alert_type, citation, rule, entries)
+
+        self.llm_calls += 1
+        try:
+            if self.gateway is not None:
+                reply = await self.gateway.call(lambda: self.generate(prompt), priority=PRIORITY_BACKGROUND)
+            else:
+                reply = await self.generate(prompt)
+        except LLMDegraded as e:
+            self.failures += 1
+            logger.warning(f"[Explainer] LLM degraded ({e.reason}); keeping templates for {len(entries)} alerts")
+            return
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"[Explainer] LLM error for {len(entries)} {alert_type} alerts: {e}")
+            return
+
+        explained = parse_batch_reply(reply, {e["alert_id"] for e in entries})
+        now = time.time()
+        for entry in entries:
+            text = explained.get(entry["alert_id"])
+            if not text:
+                continue
+            key = condition_key(entry)
+            known = {"explanation": text, "explained_at": now}
+            self._conditions[key] = known
+            self._conditions.move_to_end(key)
+            for alert_id in self._pending.get(key, [entry["alert_id"]]):
+                waiting = self._entries.get(alert_id)
+                if waiting is not None:
+                    self._apply(waiting, known)
+                    self.llm_explained += 1
+        while len(self._conditions) > self.max_conditions:
+            self._conditions.popitem(last=False)
+        logger.info(f"[Explainer] {len(explained)}/{len(entries)} {alert_type} alerts explained in one call")
+
+    @staticmethod
+    def _apply(entry: dict, known: dict):
+        entry["explanation"] = known["explanation"]
+        entry["source"] = "llm"
+        entry["explained_at"] = known["explained_at"]
+
+
+def condition_key(entry: dict) -> tuple:
+    """Alerts with the same key describe one unchanged condition."""
+    return (entry["vehicle_id"], entry.get("type"), entry.get("severity"))
+
+
+def build_batch_prompt(alert_type: str, citation: str, rule: str, entries: list[dict]) -> str:
+    """Prompt asking for one line per alert in a group."""
+    alerts = "\n".join(
+        f"{e['alert_id']} | {e['vehicle_id']} | {e['severity']} | {e['message']}" for e in entries
+    )
+    return f"""### SYSTEM INSTRUCTIONS ###
+You are PathGreen AI, an expert fleet carbon management assistant.
+Explain each fleet alert below to a fleet manager in 1-2 sentences: what
+triggered it, how it relates to the regulation, and one corrective action.
+Reply with exactly one line per alert in the form `<alert_id>: <explanation>`
+and nothing else.
+### END SYSTEM INSTRUCTIONS ###
+
+### REGULATION ({citation or "general guidance"}) ###
+{rule or "No specific rule on file."}
+### END REGULATION ###
+
+### {alert_type} ALERTS (alert_id | vehicle | severity | details) ###
+{alerts}
+### END ALERTS ###
+
+Explanations:"""
+
+
+def parse_batch_reply(reply: str, alert_ids: set[str]) -> dict[str, str]:
+    """alert_id -> explanation for every well-formed line naming a known id."""
+    explained = {}
+    for line in reply.splitlines():
+        match = _LINE_RE.match(line)
+        if match and match.group(1) in alert_ids:
+            explained[match.group(1)] = match.group(2).strip()
+    return explained
@@ -0,0 +1,331 @@
+"""
+PathGreen-AI: Local Analytics Store
+
+Embedded, time-partitioned SQLite store behind the /analytics endpoints.
+
+Rows for emission_logs, alerts and chat_history land in one table per UTC
+day (e.g. `emission_logs_20260115`), each indexed on (vehicle_id, time).
+Range queries only open the partitions that overlap the requested window
+and walk them newest-first, so history answers locally in milliseconds and
+retention is a cheap DROP TABLE instead of a bulk DELETE.
+
+Plugs into the PersistenceWriter as a backend, so it is filled by the same
+write-behind path as Supabase.
+"""
+
+import base64
+import json
+import logging
+import re
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# TABLE DEFINITIONS
+# =============================================================================
+
+# table -> (time column, {column: SQL type}, has vehicle_id)
+TABLES = {
+    "emission_logs": ("recorded_at", {
+        "vehicle_id": "TEXT NOT NULL",
+        "latitude": "REAL",
+        "longitude": "REAL",
+        "co2_grams": "REAL",
+        "status": "TEXT",
+        "recorded_at": "TEXT NOT NULL",
+    }, True),
+    "alerts": ("created_at", {
+        "vehicle_id": "TEXT NOT NULL",
+        "alert_type": "TEXT",
+        "severity": "TEXT",
+        "message": "TEXT",
+        "latitude": "REAL",
+        "longitude": "REAL",
+        "created_at": "TEXT NOT NULL",
+    }, True),
+    "chat_history": ("created_at", {
+        "user_query": "TEXT",
+        "ai_response": "TEXT",
+        "fleet_context": "TEXT",
+        "created_at": "TEXT NOT NULL",
+    }, False),
+}
+
+_PARTITION_RE = re.compile(r"^(emission_logs|alerts|chat_history)_(\d{8})$")
+
+# Keyset position: (normalized timestamp, row id within its day partition)
+Cursor = tuple[str, int]
+
+
+def encode_cursor(cursor: Cursor) -> str:
+    """Opaque, URL-safe pagination token."""
+    return base64.urlsafe_b64encode(json.dumps(list(cursor)).encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Cursor:
+    """
+    Parse a token from `encode_cursor`.
+
+    Raises:
+        ValueError: If the token is malformed
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        ts, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return _normalize_ts(ts), int(row_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {e}") from e
+
+
+def _to_utc(dt: datetime) -> datetime:
+    """Aware UTC datetime; naive values are taken to be UTC already (not local time)."""
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+def _normalize_ts(value) -> str:
+    """ISO-8601 UTC with fixed precision, so text order == time order."""
+    if isinstance(value, datetime):
+        dt = value
+    elif value:
+        dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    else:
+        dt = datetime.now(timezone.utc)
+    return _to_utc(dt).isoformat(timespec="microseconds")
+
+
+class AnalyticsStore:
+    """
+    Day-partitioned SQLite store for historical fleet data.
+
+    Args:
+        path: SQLite database file
+        retention_days: Partitions older than this are dropped (0 = keep all)
+    """
+
+    name = "analytics"
+
+    def __init__(self, path: str, retention_days: int = 0):
+        self.path = path
+        self.retention_days = retention_days
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._write_conn = self._connect()
+        self._write_conn.execute("PRAGMA journal_mode=WAL")
+        self._local = threading.local()
+        self._partitions: dict[str, set[str]] = {table: set() for table in TABLES}
+        self._lock = threading.Lock()
+
+        for (name,) in self._write_conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'"):
+            match = _PARTITION_RE.match(name)
+            if match:
+                self._partitions[match.group(1)].add(match.group(2))
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _read_conn(self) -> sqlite3.Connection:
+        """One read connection per thread (WAL lets reads run alongside writes)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    # -------------------------------------------------------------------------
+    # Partitions
+    # -------------------------------------------------------------------------
+
+    def _ensure_partition(self, table: str, day: str) -> str:
+        name = f"{table}_{day}"
+        if day in self._partitions[table]:
+            return name
+
+        time_col, columns, has_vehicle = TABLES[table]
+        column_sql = ", ".join(f"{col} {typ}" for col, typ in columns.items())
+        with self._write_conn:
+            self._write_conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {name} (id INTEGER PRIMARY KEY AUTOINCREMENT, {column_sql})"
+            )
+            self._write_conn.execute(f"CREATE INDEX IF NOT EXISTS {name}_time ON {name} ({time_col}, id)")
+            if has_vehicle:
+                self._write_conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS {name}_vehicle_time ON {name} (vehicle_id, {time_col}, id)"
+                )
+        with self._lock:
+            self._partitions[table].add(day)
+        self._apply_retention(table)
+        return name
+
+    def _apply_retention(self, table: str):
+        if self.retention_days <= 0:
+            return
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=self.retention_days)).strftime("%Y%m%d")
+        for day in sorted(d for d in self._partitions[table] if d < cutoff):
+            with self._write_conn:
+                self._write_conn.execute(f"DROP TABLE IF EXISTS {table}_{day}")
+            with self._lock:
+                self._partitions[table].discard(day)
+            logger.info(f"[Analytics] Dropped partition {table}_{day} (retention)")
+
+    def partitions(self, table: str, start: Optional[datetime] = None, end: Optional[datetime] = None) -> list[str]:
+        """Partition days overlapping [start, end], newest first."""
+        lo = _to_utc(start).strftime("%Y%m%d") if start else None
+        hi = _to_utc(end).strftime("%Y%m%d") if end else None
+        with self._lock:
+            days = list(self._partitions[table])
+        return sorted(
+            (d for d in days if (lo is None or d >= lo) and (hi is None or d <= hi)),
+            reverse=True,
+        )
+
+    # -------------------------------------------------------------------------
+    # Writes (PersistenceWriter backend interface)
+    # -------------------------------------------------------------------------
+
+    def insert_many(self, table: str, rows: list[dict]):
+        """Insert rows, routing each to its day partition."""
+        if table not in TABLES:
+            return
+        time_col, columns, _ = TABLES[table]
+        names = list(columns)
+
+        by_day: dict[str, list[tuple]] = {}
+        for row in rows:
+            ts = _normalize_ts(row.get(time_col))
+            values = []
+            for col in names:
+                value = ts if col == time_col else row.get(col)
+                if isinstance(value, (list, dict)):
+                    value = json.dumps(value, ensure_ascii=False)
+                values.append(value)
+            by_day.setdefault(ts[:10].replace("-", ""), []).append(tuple(values))
+
+        for day, values in by_day.items():
+            partition = self._ensure_partition(table, day)
+            with self._write_conn:
+                self._write_conn.executemany(
+                    f"INSERT INTO {partition} ({', '.join(names)}) VALUES ({', '.join('?' for _ in names)})",
+                    values,
+                )
+
+    # -------------------------------------------------------------------------
+    # Reads
+    # -------------------------------------------------------------------------
+
+    def _iter(
+        self,
+        table: str,
+        columns: list[str],
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        vehicle_id: Optional[str] = None,
+        limit: Optional[int] = None,
+        after: Optional[Cursor] = None,
+    ) -> Iterator[tuple[dict, Cursor]]:
+        """Yield (row, cursor) newest-first; see `iter_rows`."""
+        time_col, known, has_vehicle = TABLES[table]
+        columns = [c for c in columns if c in known]
+        select_sql = ", ".join(["id", time_col] + [c for c in columns if c != time_col])
+        remaining = limit
+
+        where, params = [], []
+        if start:
+            where.append(f"{time_col} >= ?")
+            params.append(_normalize_ts(start))
+        if end:
+            where.append(f"{time_col} <= ?")
+            params.append(_normalize_ts(end))
+        if vehicle_id and has_vehicle:
+            where.append("vehicle_id = ?")
+            params.append(vehicle_id)
+
+        after_day = after[0][:10].replace("-", "") if after else None
+
+        conn = self._read_conn()
+        for day in self.partitions(table, start, end):
+            if after_day and day > after_day:
+                continue
+
+            part_where, part_params = list(where), list(params)
+            if after_day and day == after_day:
+                # Keyset condition: strictly older than the last row returned
+                part_where.append(f"({time_col} < ? OR ({time_col} = ? AND id < ?))")
+                part_params.extend([after[0], after[0], after[1]])
+
+            sql = f"SELECT {select_sql} FROM {table}_{day}"
+            if part_where:
+                sql += f" WHERE {' AND '.join(part_where)}"
+            sql += f" ORDER BY {time_col} DESC, id DESC"
+            if remaining is not None:
+                sql += f" LIMIT {int(remaining)}"
+
+            try:
+                cursor = conn.execute(sql, part_params)
+            except sqlite3.OperationalError:
+                # Partition dropped by retention between listing and querying
+                continue
+            for row in cursor:
+                yield {c: row[c] for c in columns}, (row[time_col], row["id"])
+                if remaining is not None:
+                    remaining -= 1
+                    if remaining <= 0:
+                        return
+
+    def iter_rows(
+        self,
+        table: str,
+        columns: list[str],
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        vehicle_id: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[dict]:
+        """
+        Rows newest-first across partitions.
+
+        Args:
+            table: emission_logs, alerts or chat_history
+            columns: Columns to return
+            start, end: Optional time window (inclusive)
+            vehicle_id: Optional vehicle filter (tables that have one)
+            limit: Max rows (None = unbounded)
+        """
+        for row, _ in self._iter(table, columns, start, end, vehicle_id, limit):
+            yield row
+
+    def query(self, table: str, columns: list[str], **filters) -> list[dict]:
+        """Materialized `iter_rows`."""
+        return list(self.iter_rows(table, columns, **filters))
+
+    def fetch_page(
+        self,
+        table: str,
+        columns: list[str],
+        page_size: int,
+        after: Optional[Cursor] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        vehicle_id: Optional[str] = None,
+    ) -> tuple[list[dict], Optional[Cursor]]:
+        """
+        One keyset page, newest-first.
+
+        Each call is a fresh bounded query resuming strictly after `after`,
+        so paging through any range keeps memory and read transactions small.
+
+        Returns:
+            (rows, next cursor or None when the range is exhausted)
+        """
+        rows, last = [], None
+        for row, last in self._iter(table, columns, start, end, vehicle_id, page_size, after):
+            rows.append(row)
+        return rows, (last if len(rows) == page_size else None)
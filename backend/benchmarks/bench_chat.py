@@ -0,0 +1,183 @@
+"""
+PathGreen-AI: Chat Path Benchmark
+
+Load-tests POST /chat (or /chat/stream) in-process against the fake LLM
+backend, so our own overhead (retrieval, caching, gateway queueing,
+prompt building) can be measured separately from provider latency.
+
+Run once with `--latency-ms 0` to see pure server overhead, then with a
+realistic provider profile to see queueing and tail behaviour.
+
+Usage (from backend/):
+    python benchmarks/bench_chat.py [--requests 200] [--concurrency 20]
+        [--distinct 50] [--latency-ms 300] [--sigma 0.5] [--error-rate 0]
+        [--stream]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+QUESTIONS = [
+    "What are the BS-VI idle limits?",
+    "Which trucks are critical right now?",
+    "Why is TRK-{n} flagged?",
+    "Explain Green Zone regulations",
+    "How much CO2 did TRK-{n} emit?",
+]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def asgi_post(app, path: str, body: dict) -> tuple[int, float, float, bytes]:
+    """
+    Minimal in-process ASGI POST.
+
+    Returns:
+        (status, seconds to first body byte, seconds to completion, body)
+    """
+    payload = json.dumps(body).encode("utf-8")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "POST", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": b"", "root_path": "", "server": ("bench", 80), "client": ("bench", 1),
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(payload)).encode())],
+    }
+    sent = False
+    status, first, chunks = 0, None, []
+    start = time.perf_counter()
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal status, first
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body" and message.get("body"):
+            if first is None:
+                first = time.perf_counter() - start
+            chunks.append(message["body"])
+
+    await app(scope, receive, send)
+    total = time.perf_counter() - start
+    return status, first if first is not None else total, total, b"".join(chunks)
+
+
+async def run(args):
+    import main
+
+    # Seed the fleet store and prompt context without starting the broadcast loop
+    fleet_data, _ = main.simulator.next_tick()
+    snapshot = main.fleet_store.apply(fleet_data)
+    main.fleet_context.update(snapshot.vehicles, version=snapshot.version)
+    if main.rag_handler and hasattr(main.rag_handler, "initialize"):
+        main.rag_handler.initialize()
+
+    backend = main.llm_backend
+    provider_times: list[float] = []
+    generate = backend.generate
+
+    async def timed_generate(prompt):
+        t = time.perf_counter()
+        try:
+            return await generate(prompt)
+        finally:
+            provider_times.append(time.perf_counter() - t)
+
+    backend.generate = timed_generate
+
+    path = "/chat/stream" if args.stream else "/chat"
+    fleet_ids = [v["id"] for v in snapshot.vehicle_list]
+    queries = [
+        QUESTIONS[i % len(QUESTIONS)].format(n=fleet_ids[i % len(fleet_ids)][4:]) + f" #{i // len(QUESTIONS)}"
+        for i in range(args.distinct)
+    ]
+
+    sem = asyncio.Semaphore(args.concurrency)
+    ttfb, totals, outcomes = [], [], {"ok": 0, "mock": 0, "cached": 0, "error": 0}
+
+    async def one(i: int):
+        async with sem:
+            status, first, total, body = await asgi_post(main.app, path, {"message": queries[i % len(queries)]})
+        ttfb.append(first)
+        totals.append(total)
+        text = body.decode("utf-8", "replace")
+        if status != 200 or '"error"' in text:
+            outcomes["error"] += 1
+        elif '"mock"' in text:
+            outcomes["mock"] += 1
+        elif '"cached"' in text:
+            outcomes["cached"] += 1
+        else:
+            outcomes["ok"] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    def row(name, values):
+        ms = [v * 1000 for v in values]
+        return (
+            f"{name:<18} {percentile(ms, 50):>8.1f} {percentile(ms, 95):>8.1f} "
+            f"{percentile(ms, 99):>8.1f} {max(ms, default=0):>8.1f}"
+        )
+
+    print(f"\n{path}: {args.requests} requests, concurrency {args.concurrency}, "
+          f"{args.distinct} distinct questions, fake provider {args.latency_ms:.0f}ms (sigma {args.sigma})")
+    print(f"{'':<18} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    print(row("time to 1st byte", ttfb))
+    print(row("end to end", totals))
+    if provider_times:
+        print(row("provider", provider_times))
+    print(f"\nthroughput: {args.requests / elapsed:.1f} req/s   outcomes: {outcomes}")
+    print(f"provider calls: {len(provider_times)}   mean provider: "
+          f"{statistics.mean(provider_times) * 1000 if provider_times else 0:.1f}ms")
+    print(f"gateway: {json.dumps(main.llm_gateway.stats()['fallbacks'])}  "
+          f"cache hit rate: {main.chat_cache.stats()['hit_rate']}")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--distinct", type=int, default=50, help="Distinct questions (controls cache hit rate)")
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--sigma", type=float, default=0.5)
+    parser.add_argument("--tokens-per-second", type=float, default=200)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--stream", action="store_true", help="Benchmark /chat/stream instead of /chat")
+    args = parser.parse_args()
+
+    # Configure the app before it's imported: fake LLM, no external sinks
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["FAKE_LLM_LATENCY_MS"] = str(args.latency_ms)
+    os.environ["FAKE_LLM_LATENCY_SIGMA"] = str(args.sigma)
+    os.environ["FAKE_LLM_TOKENS_PER_SECOND"] = str(args.tokens_per_second)
+    os.environ["FAKE_LLM_ERROR_RATE"] = str(args.error_rate)
+    os.environ.setdefault("FAKE_LLM_SEED", "42")
+    os.environ.setdefault("LLM_RATE_PER_MINUTE", "0")
+    os.environ["ANALYTICS_DB_PATH"] = ""
+    os.environ["SUPABASE_URL"] = ""
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main_cli()
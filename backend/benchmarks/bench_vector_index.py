@@ -0,0 +1,109 @@
+"""
+PathGreen-AI: Local Vector Index Benchmark
+
+Builds the offline hashed n-gram embeddings and IVF index over a synthetic
+corpus of chunks resampled from the regulation documents, then reports
+embed/build/save/load time, per-query latency (single and batched) and
+recall@k against a flat scan.
+
+Usage (from backend/):
+    python benchmarks/bench_vector_index.py [--chunks 20000] [--queries 200] [--n-probe 8]
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np  # noqa: E402
+
+from rag import FallbackRAGHandler, tokenize  # noqa: E402
+from vector_index import DEFAULT_N_PROBE, HashingEmbedder, VectorIndex  # noqa: E402
+
+QUERIES = [
+    "How long can a truck idle in a metro zone?",
+    "penalty for speeding in a green zone",
+    "CO2 limit for heavy commercial vehicles",
+    "load adjustment formula for loaded trucks",
+    "what happens after repeated idling violations",
+    "emission spike rules for medium vehicles",
+]
+
+
+def make_corpus(size: int) -> list[str]:
+    """
+    Chunks of ~80 words, each drawn mostly from one real regulation chunk
+    (its topic) with some vocabulary from everywhere mixed in.
+    """
+    handler = FallbackRAGHandler()
+    handler.initialize()
+    topics = [tokenize(chunk["content"]) for chunk in handler.chunks]
+    vocabulary = [word for topic in topics for word in topic]
+    corpus = []
+    for _ in range(size):
+        topic = random.choice(topics)
+        words = random.choices(topic, k=56) + random.choices(vocabulary, k=24)
+        random.shuffle(words)
+        corpus.append(" ".join(words))
+    return corpus
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--n-probe", type=int, default=DEFAULT_N_PROBE)
+    args = parser.parse_args()
+
+    random.seed(0)
+    corpus = make_corpus(args.chunks)
+    embedder = HashingEmbedder(tokenize=tokenize)
+
+    vectors, embed_s = timed(lambda: embedder.embed(corpus))
+    index, build_s = timed(lambda: VectorIndex.build(vectors, embedder.model_name))
+    with tempfile.TemporaryDirectory() as tmp:
+        _, save_s = timed(lambda: index.save(Path(tmp) / "index"))
+        loaded, load_s = timed(lambda: VectorIndex.load(Path(tmp) / "index", embedder.model_name))
+
+        print(f"{args.chunks} chunks, dim {embedder.dim}, {index.n_lists} lists, n_probe {args.n_probe}")
+        print(f"embed {embed_s:.2f}s   build {build_s:.2f}s   save {save_s * 1000:.0f}ms   load (mmap) {load_s * 1000:.1f}ms")
+
+        queries = [random.choice(QUERIES) + f" {random.choice(corpus).split()[0]}" for _ in range(args.queries)]
+        query_vectors, qembed_s = timed(lambda: embedder.embed(queries))
+
+        _, single_s = timed(lambda: [loaded.search(q, args.top_k, args.n_probe) for q in query_vectors])
+        batched, batch_s = timed(lambda: loaded.search(query_vectors, args.top_k, args.n_probe))
+        flat = VectorIndex.build(vectors, embedder.model_name, n_lists=1)
+        exact, flat_s = timed(lambda: [flat.search(q, args.top_k)[0] for q in query_vectors])
+
+        hits = sum(
+            len({i for i, _ in approx} & {i for i, _ in truth})
+            for approx, truth in zip(batched, exact)
+        )
+        total = sum(len(truth) for truth in exact)
+        # Near-duplicate chunks tie, so also compare the best score found
+        ratios = [approx[0][1] / truth[0][1] for approx, truth in zip(batched, exact) if approx and truth]
+
+    per = 1e6 / args.queries
+    print(f"\n{'per query':<22} {'µs':>8}")
+    print(f"{'embed query':<22} {qembed_s * per:>8.1f}")
+    print(f"{'IVF search':<22} {single_s * per:>8.1f}")
+    print(f"{'IVF search (batched)':<22} {batch_s * per:>8.1f}")
+    print(f"{'flat scan':<22} {flat_s * per:>8.1f}")
+    print(f"\nrecall@{args.top_k} vs flat: {hits / total if total else 1.0:.3f}   "
+          f"top-1 similarity vs flat: {np.mean(ratios) if ratios else 1.0:.3f}")
+
+
+if __name__ == "__main__":
+    main()
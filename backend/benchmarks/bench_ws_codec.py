@@ -0,0 +1,99 @@
+"""
+PathGreen-AI: /ws Codec Benchmark
+
+Compares encode time and frame size of the JSON and binary fleet frame
+encodings, for full keyframes and per-tick deltas.
+
+Usage (from backend/):
+    python benchmarks/bench_ws_codec.py [--sizes 100 1000 5000] [--ticks 50]
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fleet_codec import DeltaEncoder  # noqa: E402
+
+STATUSES = ["MOVING", "MOVING", "MOVING", "IDLE", "WARNING", "CRITICAL"]
+
+
+def make_fleet(size: int) -> list[dict]:
+    """Synthetic fleet around Bangalore, shaped like FleetSimulator output."""
+    return [
+        {
+            "id": f"TRK-{100 + i}",
+            "lat": 12.97 + random.uniform(-0.2, 0.2),
+            "lng": 77.59 + random.uniform(-0.2, 0.2),
+            "status": random.choice(STATUSES),
+            "co2": random.randint(350, 1500),
+            "speed": random.uniform(20, 70),
+            "idle_seconds": 0,
+        }
+        for i in range(size)
+    ]
+
+
+def advance(fleet: list[dict]) -> list[dict]:
+    """One simulator-like tick: moving trucks drift, the rest mostly hold."""
+    updated = []
+    for truck in fleet:
+        truck = truck.copy()
+        if truck["status"] == "MOVING":
+            truck["lat"] += random.uniform(-0.002, 0.002)
+            truck["lng"] += random.uniform(-0.002, 0.002)
+            truck["speed"] = max(20, min(70, truck["speed"] + random.uniform(-5, 5)))
+        else:
+            truck["idle_seconds"] += 0.5
+        updated.append(truck)
+    return updated
+
+
+def bench(size: int, ticks: int) -> dict:
+    """Encode `ticks` frames of a `size`-vehicle fleet in every format."""
+    encoder = DeltaEncoder(keyframe_every=10 ** 9)
+    fleet = make_fleet(size)
+    encoder.next_frame(fleet, [], "simulator")
+
+    frames = []
+    for _ in range(ticks):
+        fleet = advance(fleet)
+        frames.append(encoder.next_frame(fleet, [], "simulator"))
+
+    results = {}
+    for keyframe in (True, False):
+        for binary in (False, True):
+            start = time.perf_counter()
+            total_bytes = 0
+            for frame in frames:
+                encoded = frame.encode(keyframe=keyframe, binary=binary)
+                total_bytes += len(encoded.encode("utf-8") if isinstance(encoded, str) else encoded)
+            elapsed = time.perf_counter() - start
+            label = f"{'key' if keyframe else 'delta'}/{'bin' if binary else 'json'}"
+            results[label] = (elapsed / ticks * 1e6, total_bytes / ticks)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--ticks", type=int, default=50)
+    args = parser.parse_args()
+
+    random.seed(42)
+    print(f"{'vehicles':>8}  {'format':<10} {'encode µs':>12} {'bytes':>10} {'vs json':>8}")
+    for size in args.sizes:
+        results = bench(size, args.ticks)
+        for kind in ("key", "delta"):
+            json_us, json_bytes = results[f"{kind}/json"]
+            for fmt in ("json", "bin"):
+                us, size_bytes = results[f"{kind}/{fmt}"]
+                ratio = json_bytes / size_bytes if size_bytes else 0.0
+                print(f"{size:>8}  {kind + '/' + fmt:<10} {us:>12.1f} {size_bytes:>10.0f} {ratio:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
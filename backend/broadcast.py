@@ -0,0 +1,455 @@
+"""
+PathGreen-AI: WebSocket Broadcast Hub
+
+Fan-out of fleet frames to every connected /ws client.
+A single producer hands each tick to the hub once. Clients are grouped into
+views by subscription scope (whole fleet, a bounding box, or a set of
+vehicle ids); each view builds one FleetFrame per tick and every client of
+that view shares its memoized encodings.
+
+Frames are never sent inline by the producer. Each client has a bounded
+outbound queue drained by its own sender task, and a slow-consumer policy
+decides what happens when that queue fills up:
+- "coalesce":   discard the backlog and keep only the newest frame
+- "drop":       discard the oldest queued frame to make room
+- "disconnect": close the connection (also once the backlog is too old)
+Delta clients that miss frames either way get a keyframe next.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Callable, Optional
+
+from fastapi import WebSocket
+
+from fleet_codec import DeltaEncoder, FleetFrame, Message, VehicleIndex, MODE_FULL, MODE_DELTA
+from spatial_index import GridIndex
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on ids in a single vehicle-set subscription
+MAX_SCOPE_VEHICLES = 1000
+
+POLICY_COALESCE = "coalesce"
+POLICY_DROP = "drop"
+POLICY_DISCONNECT = "disconnect"
+SLOW_CLIENT_POLICIES = (POLICY_COALESCE, POLICY_DROP, POLICY_DISCONNECT)
+
+# WebSocket close code for evicted slow consumers ("Try Again Later")
+CLOSE_TRY_AGAIN_LATER = 1013
+
+# Scope keys: None = whole fleet, ("bbox", (min_lat, min_lng, max_lat, max_lng)),
+# or ("ids", (sorted vehicle ids...))
+Scope = Optional[tuple]
+
+
+def parse_scope(message: dict) -> Scope:
+    """
+    Turn a SUBSCRIBE control message into a hashable scope key.
+
+    Accepted forms:
+        {"type": "SUBSCRIBE", "bbox": [min_lat, min_lng, max_lat, max_lng]}
+        {"type": "SUBSCRIBE", "vehicle_ids": ["TRK-101", ...]}
+        {"type": "SUBSCRIBE"}  -> whole fleet
+
+    Raises:
+        ValueError: If the bbox or id list is malformed
+    """
+    bbox = message.get("bbox")
+    vehicle_ids = message.get("vehicle_ids")
+
+    if bbox is not None:
+        if not isinstance(bbox, list) or len(bbox) != 4:
+            raise ValueError("bbox must be [min_lat, min_lng, max_lat, max_lng]")
+        try:
+            values = [float(x) for x in bbox]
+        except (TypeError, ValueError):
+            raise ValueError("bbox values must be numbers") from None
+        # json.loads accepts NaN/Infinity, which the grid index can't bucket
+        if not all(math.isfinite(x) for x in values):
+            raise ValueError("bbox values must be finite")
+        min_lat, max_lat = (min(max(x, -90.0), 90.0) for x in (values[0], values[2]))
+        min_lng, max_lng = (min(max(x, -180.0), 180.0) for x in (values[1], values[3]))
+        if min_lat > max_lat or min_lng > max_lng:
+            raise ValueError("bbox corners are inverted")
+        return ("bbox", (min_lat, min_lng, max_lat, max_lng))
+
+    if vehicle_ids is not None:
+        if not isinstance(vehicle_ids, list) or not all(isinstance(v, str) for v in vehicle_ids):
+            raise ValueError("vehicle_ids must be a list of strings")
+        if len(vehicle_ids) > MAX_SCOPE_VEHICLES:
+            raise ValueError(f"vehicle_ids is limited to {MAX_SCOPE_VEHICLES} entries")
+        return ("ids", tuple(sorted(set(vehicle_ids))))
+
+    return None
+
+
+class Subscriber:
+    """
+    A connected /ws client, its protocol state and its outbound queue.
+
+    The producer only ever calls `offer`, which never blocks; the sender
+    task started by the hub drains the queue at whatever pace the client's
+    link allows.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        mode: str = MODE_FULL,
+        binary: bool = False,
+        queue_size: int = 8,
+        policy: str = POLICY_COALESCE,
+        max_lag_seconds: float = 5.0,
+    ):
+        self.websocket = websocket
+        self.mode = mode
+        self.binary = binary
+        self.scope: Scope = None
+        self.last_seq: Optional[int] = None  # None forces a keyframe
+        self.index_version = 0               # vehicle index size known to the client
+
+        self.queue_size = max(1, queue_size)
+        self.policy = policy
+        self.max_lag_seconds = max_lag_seconds
+        self._queue: deque[FleetFrame] = deque()
+        self._wakeup = asyncio.Event()
+        self._evicted = False
+        self._task: Optional[asyncio.Task] = None
+
+        # Counters exposed through BroadcastHub.stats()
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.keyframes_sent = 0
+        self.max_lag = 0.0
+
+    @property
+    def lag_seconds(self) -> float:
+        """Age of the oldest frame still waiting to be sent."""
+        if not self._queue:
+            return 0.0
+        return time.time() - self._queue[0].created_at
+
+    def offer(self, frame: FleetFrame):
+        """
+        Queue a frame for sending, applying the slow-consumer policy.
+
+        Never blocks, so one slow client cannot stall the tick loop.
+        """
+        if self._evicted:
+            return
+
+        if len(self._queue) >= self.queue_size:
+            if self.policy == POLICY_COALESCE:
+                self.frames_dropped += len(self._queue)
+                self._queue.clear()
+            elif self.policy == POLICY_DROP:
+                self.frames_dropped += 1
+                self._queue.popleft()
+            else:
+                self._evict("send queue full")
+                return
+
+        self._queue.append(frame)
+        lag = self.lag_seconds
+        self.max_lag = max(self.max_lag, lag)
+        if self.policy == POLICY_DISCONNECT and lag > self.max_lag_seconds:
+            self._evict(f"lagging {lag:.1f}s behind")
+            return
+
+        self._wakeup.set()
+
+    def _evict(self, reason: str):
+        logger.warning(f"[WS] Disconnecting slow client {self.client_id}: {reason}")
+        self._evicted = True
+        self._queue.clear()
+        self._wakeup.set()
+
+    @property
+    def client_id(self) -> str:
+        client = self.websocket.client
+        return f"{client.host}:{client.port}" if client else "unknown"
+
+    def start(self, on_done: Callable[[], None]):
+        """Start the sender task; `on_done` runs when it exits for any reason."""
+        self._task = asyncio.create_task(self._run())
+        self._task.add_done_callback(lambda _: on_done())
+
+    def stop(self):
+        """Cancel the sender task."""
+        if self._task and not self._task.done():
+            self._task.cancel()
+
+    async def _run(self):
+        try:
+            while True:
+                if self._evicted:
+                    await self.websocket.close(code=CLOSE_TRY_AGAIN_LATER)
+                    return
+                if not self._queue:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+
+                frame = self._queue.popleft()
+                if self._wants_keyframe(frame):
+                    self.keyframes_sent += 1
+                messages = self.messages_for(frame)
+                self.last_seq = frame.seq
+                await self.send(messages)
+                self.frames_sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"[WS] Send failed for {self.client_id}: {e}")
+
+    def stats(self) -> dict:
+        """Per-client delivery counters."""
+        return {
+            "client": self.client_id,
+            "mode": self.mode,
+            "binary": self.binary,
+            "scoped": self.scope is not None,
+            "queued": len(self._queue),
+            "lag_seconds": round(self.lag_seconds, 3),
+            "max_lag_seconds": round(self.max_lag, 3),
+            "frames_sent": self.frames_sent,
+            "frames_dropped": self.frames_dropped,
+            "keyframes_sent": self.keyframes_sent,
+        }
+
+    def request_keyframe(self):
+        """Resynchronize: the next frame sent will be a full keyframe."""
+        self.last_seq = None
+
+    def reset_view(self):
+        """
+        Switch to another view's frames.
+
+        Sequence numbers are per view, so queued frames from the old view
+        are dropped (a new-view delta must never follow one of them) and
+        the next frame is a keyframe.
+        """
+        self.frames_dropped += len(self._queue)
+        self._queue.clear()
+        self.request_keyframe()
+
+    def _wants_keyframe(self, frame: FleetFrame) -> bool:
+        return self.mode != MODE_DELTA or frame.is_keyframe or self.last_seq != frame.seq - 1
+
+    def messages_for(self, frame: FleetFrame) -> list[Message]:
+        """
+        Pick the encoding(s) for this client.
+
+        Delta clients only get a delta when they hold the frame it applies
+        to; anything else (first frame, gap, explicit request) gets a keyframe.
+        Binary clients also get the vehicle index when it has grown, and
+        alerts as a separate text frame.
+        """
+        keyframe = self._wants_keyframe(frame)
+
+        if not self.binary:
+            return [frame.encode(keyframe=keyframe)]
+
+        messages: list[Message] = [frame.encode(keyframe=keyframe, binary=True)]
+        if frame.index.version != self.index_version:
+            messages.insert(0, frame.index.encode())
+            self.index_version = frame.index.version
+        alerts = frame.encode_alerts()
+        if alerts:
+            messages.append(alerts)
+        return messages
+
+    async def send(self, messages: list[Message]):
+        """Send text or binary messages in order."""
+        for message in messages:
+            if isinstance(message, bytes):
+                await self.websocket.send_bytes(message)
+            else:
+                await self.websocket.send_text(message)
+
+
+class FleetView:
+    """
+    All subscribers sharing one scope.
+
+    Owns the DeltaEncoder for that scope, so delta frames and sequence
+    numbers are consistent for every client of the view.
+    """
+
+    def __init__(self, scope: Scope, keyframe_every: int, index: VehicleIndex):
+        self.scope = scope
+        self.encoder = DeltaEncoder(keyframe_every=keyframe_every, index=index)
+        self.subscribers: dict[WebSocket, Subscriber] = {}
+        self.last_frame: Optional[FleetFrame] = None
+
+    def select(self, grid: Optional[GridIndex], vehicles: list[dict]) -> list[dict]:
+        """Vehicles visible in this view for the current tick."""
+        if self.scope is None:
+            return vehicles
+        kind, value = self.scope
+        if kind == "bbox":
+            return grid.query_bbox(*value)
+        return grid.query_ids(value)
+
+    def next_frame(
+        self,
+        grid: Optional[GridIndex],
+        vehicles: list[dict],
+        alerts: list[dict],
+        engine: str,
+    ) -> FleetFrame:
+        """Build this view's frame for the current tick."""
+        visible = self.select(grid, vehicles)
+        if self.scope is not None and alerts:
+            visible_ids = {v["id"] for v in visible}
+            alerts = [a for a in alerts if a.get("vehicle_id") in visible_ids]
+        self.last_frame = self.encoder.next_frame(visible, alerts, engine)
+        return self.last_frame
+
+
+class BroadcastHub:
+    """
+    Registry of connected WebSocket clients, grouped into views.
+
+    The producer calls `publish` once per tick. The spatial index is built
+    once, each view with subscribers builds one frame, and each frame is
+    serialized at most once per encoding no matter how many viewers share it.
+    Publishing only enqueues, so tick latency is independent of client speed.
+    """
+
+    def __init__(
+        self,
+        keyframe_every: int = 20,
+        queue_size: int = 8,
+        policy: str = POLICY_COALESCE,
+        max_lag_seconds: float = 5.0,
+    ):
+        if policy not in SLOW_CLIENT_POLICIES:
+            logger.warning(f"[WS] Unknown slow-client policy {policy!r}, using {POLICY_COALESCE!r}")
+            policy = POLICY_COALESCE
+        self.keyframe_every = keyframe_every
+        self.queue_size = queue_size
+        self.policy = policy
+        self.max_lag_seconds = max_lag_seconds
+        self.index = VehicleIndex()
+        self._global = FleetView(None, keyframe_every, self.index)
+        self._views: dict[Scope, FleetView] = {None: self._global}
+        self._subscribers: dict[WebSocket, Subscriber] = {}
+        self.frames_published = 0
+        self.view_errors = 0
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    @property
+    def last_frame(self) -> Optional[FleetFrame]:
+        """Latest whole-fleet frame."""
+        return self._global.last_frame
+
+    def new_subscriber(self, websocket: WebSocket, mode: str = MODE_FULL, binary: bool = False) -> Subscriber:
+        """Create a subscriber using the hub's queue and slow-client settings."""
+        return Subscriber(
+            websocket,
+            mode=mode,
+            binary=binary,
+            queue_size=self.queue_size,
+            policy=self.policy,
+            max_lag_seconds=self.max_lag_seconds,
+        )
+
+    def subscribe(self, subscriber: Subscriber):
+        """Register a client and start its sender task."""
+        websocket = subscriber.websocket
+        self._subscribers[websocket] = subscriber
+        self._view_for(subscriber.scope).subscribers[websocket] = subscriber
+        subscriber.start(on_done=lambda: self.unsubscribe(websocket))
+        logger.info(
+            f"[WS] Client subscribed, mode={subscriber.mode}, binary={subscriber.binary} "
+            f"({len(self._subscribers)} connected)"
+        )
+
+    def unsubscribe(self, websocket: WebSocket):
+        """Remove a client and stop its sender; safe to call more than once."""
+        subscriber = self._subscribers.pop(websocket, None)
+        if subscriber is not None:
+            subscriber.stop()
+            self._leave_view(subscriber)
+            logger.info(f"[WS] Client unsubscribed ({len(self._subscribers)} connected)")
+
+    def set_scope(self, subscriber: Subscriber, scope: Scope):
+        """
+        Move a client to another scope.
+
+        The new view has its own sequence, so frames still queued from the
+        old view are dropped and the next frame is a keyframe.
+        """
+        if scope == subscriber.scope:
+            return
+        registered = subscriber.websocket in self._subscribers
+        if registered:
+            self._leave_view(subscriber)
+        subscriber.scope = scope
+        subscriber.reset_view()
+        if registered:
+            self._view_for(scope).subscribers[subscriber.websocket] = subscriber
+
+    def _view_for(self, scope: Scope) -> FleetView:
+        view = self._views.get(scope)
+        if view is None:
+            view = self._views[scope] = FleetView(scope, self.keyframe_every, self.index)
+        return view
+
+    def _leave_view(self, subscriber: Subscriber):
+        view = self._views.get(subscriber.scope)
+        if view is None:
+            return
+        view.subscribers.pop(subscriber.websocket, None)
+        if not view.subscribers and view.scope is not None:
+            del self._views[view.scope]
+
+    def publish(self, vehicles: list[dict], alerts: list[dict], engine: str):
+        """
+        Build this tick's frames and queue them for every subscriber.
+
+        The whole-fleet view always advances (it backs the connect-time
+        keyframe); scoped views only exist while they have clients.
+
+        Args:
+            vehicles: Current vehicle dicts (must not be mutated afterwards)
+            alerts: Alerts raised during this tick
+            engine: "pathway" or "simulator"
+        """
+        grid = GridIndex(vehicles) if len(self._views) > 1 else None
+
+        for view in list(self._views.values()):
+            # One broken view must not stop frames for every other view
+            try:
+                frame = view.next_frame(grid, vehicles, alerts, engine)
+            except Exception as e:
+                logger.error(f"[WS] Frame build failed for view {view.scope}: {e}")
+                self.view_errors += 1
+                for subscriber in view.subscribers.values():
+                    subscriber.request_keyframe()
+                continue
+            for subscriber in view.subscribers.values():
+                subscriber.offer(frame)
+        self.frames_published += 1
+
+    def stats(self) -> dict:
+        """Hub-wide and per-client delivery metrics."""
+        clients = [s.stats() for s in self._subscribers.values()]
+        return {
+            "clients": len(clients),
+            "views": len(self._views),
+            "policy": self.policy,
+            "queue_size": self.queue_size,
+            "frames_published": self.frames_published,
+            "view_errors": self.view_errors,
+            "frames_dropped": sum(c["frames_dropped"] for c in clients),
+            "max_lag_seconds": max((c["lag_seconds"] for c in clients), default=0.0),
+            "per_client": clients,
+        }
@@ -0,0 +1,284 @@
+"""
+PathGreen-AI: Chat Response Cache
+
+LRU + TTL cache in front of the LLM call.
+
+Keys combine the normalized question with a fingerprint of the part of the
+fleet state the answer depends on:
+- vehicles mentioned by id (TRK-102) -> their status and CO₂ band
+- fleet-wide questions ("which trucks are critical") -> every vehicle's
+  status and CO₂ band
+- anything else (regulation questions) -> nothing, so "what are the BS-VI
+  idle limits" hits no matter how the fleet moves
+
+An optional SQLite tier keeps answers across restarts. SingleFlight covers
+the gap before the first answer is cached: identical concurrent requests
+share one pending LLM call.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# KEYS
+# =============================================================================
+
+VEHICLE_ID_RE = re.compile(r"\btrk[-\s]?(\d+)\b", re.IGNORECASE)
+
+# Words that make an answer depend on the live fleet rather than regulations
+FLEET_TERMS_RE = re.compile(
+    r"\b(fleet|trucks?|vehicles?|critical|warning|moving|status|which|worst|top|"
+    r"current(ly)?|now|today|emitters?|flagged)\b"
+)
+
+# CO₂ readings jitter every tick; answers only change when a band does
+CO2_BAND_GRAMS = 50
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    return re.sub(r"\s+", " ", query.lower()).strip().rstrip("?!. ")
+
+
+def mentioned_vehicle_ids(query: str) -> list[str]:
+    """Vehicle ids named in a query, normalized to "TRK-<n>"."""
+    return sorted({f"TRK-{num}" for num in VEHICLE_ID_RE.findall(query)})
+
+
+def fleet_fingerprint(query: str, vehicles: Iterable[dict]) -> str:
+    """
+    Hash of the fleet slice a query's answer depends on.
+
+    Args:
+        query: User question
+        vehicles: Current vehicle dicts ("id", "status", "co2")
+
+    Returns:
+        Hex digest, or "" for questions that don't depend on the fleet
+    """
+    ids = mentioned_vehicle_ids(query)
+    if ids:
+        wanted = set(ids)
+        relevant = [v for v in vehicles if v.get("id") in wanted]
+    elif FLEET_TERMS_RE.search(query.lower()):
+        relevant = list(vehicles)
+    else:
+        return ""
+
+    parts = sorted(
+        f"{v.get('id')}:{v.get('status')}:{int(v.get('co2') or 0) // CO2_BAND_GRAMS}"
+        for v in relevant
+    )
+    # Mentioned-but-unknown ids still need distinct keys
+    parts.extend(f"?{vid}" for vid in ids if vid not in {v.get("id") for v in relevant})
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def make_key(query: str, vehicles: Iterable[dict]) -> str:
+    """Cache key for a query against the current fleet."""
+    normalized = normalize_query(query)
+    fingerprint = fleet_fingerprint(normalized, vehicles)
+    return hashlib.sha256(f"{normalized}\x00{fingerprint}".encode("utf-8")).hexdigest()
+
+
+# =============================================================================
+# CACHE
+# =============================================================================
+
+class ResponseCache:
+    """
+    In-memory LRU with per-entry TTL and an optional SQLite tier.
+
+    Values are JSON-serializable dicts (e.g. {"reply": ..., "citations": [...]}).
+
+    Args:
+        max_entries: Entries kept in memory before the least recently used is evicted
+        ttl_seconds: Lifetime of an entry in both tiers
+        db_path: SQLite file for the persistent tier (None = memory only)
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 300.0, db_path: Optional[str] = None):
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+
+        self._metrics = {
+            "hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expired": 0,
+        }
+
+        if db_path:
+            try:
+                Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+                self._db = sqlite3.connect(db_path, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS chat_cache "
+                    "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+                )
+                with self._db:
+                    self._db.execute("DELETE FROM chat_cache WHERE expires_at < ?", (time.time(),))
+                logger.info(f"[Cache] Persistent chat cache: {db_path}")
+            except Exception as e:
+                logger.warning(f"[Cache] Disk tier disabled: {e}")
+                self._db = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[dict]:
+        """Cached value, or None on a miss or expired entry."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self._metrics["hits"] += 1
+                    return entry[1]
+                del self._entries[key]
+                self._metrics["expired"] += 1
+
+            value = self._disk_get(key, now)
+            if value is not None:
+                self._insert(key, value[1], value[0])
+                self._metrics["hits"] += 1
+                self._metrics["disk_hits"] += 1
+                return value[1]
+
+            self._metrics["misses"] += 1
+            return None
+
+    def put(self, key: str, value: dict):
+        """Store a value in both tiers."""
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._insert(key, value, expires_at)
+            self._metrics["stores"] += 1
+            if self._db is not None:
+                try:
+                    with self._db:
+                        self._db.execute(
+                            "INSERT OR REPLACE INTO chat_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                            (key, json.dumps(value, ensure_ascii=False), expires_at),
+                        )
+                except Exception as e:
+                    logger.warning(f"[Cache] Disk write failed: {e}")
+
+    def clear(self):
+        """Drop every entry in both tiers."""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                with self._db:
+                    self._db.execute("DELETE FROM chat_cache")
+
+    def stats(self) -> dict:
+        """Counters for /metrics."""
+        lookups = self._metrics["hits"] + self._metrics["misses"]
+        return {
+            **self._metrics,
+            "size": len(self._entries),
+            "hit_rate": round(self._metrics["hits"] / lookups, 3) if lookups else 0.0,
+            "disk": self._db is not None,
+        }
+
+    def _insert(self, key: str, value: dict, expires_at: float):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._metrics["evictions"] += 1
+
+    def _disk_get(self, key: str, now: float) -> Optional[tuple[float, dict]]:
+        if self._db is None:
+            return None
+        try:
+            row = self._db.execute(
+                "SELECT value, expires_at FROM chat_cache WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+        except Exception as e:
+            logger.warning(f"[Cache] Disk read failed: {e}")
+            return None
+        return (row[1], json.loads(row[0])) if row else None
+
+
+# =============================================================================
+# IN-FLIGHT DE-DUPLICATION
+# =============================================================================
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into one execution.
+
+    The first caller for a key starts the work as a task; callers arriving
+    while it runs await the same task. Each waiter is shielded, so a client
+    disconnecting doesn't cancel the call for the others. Errors propagate
+    to every waiter and nothing is remembered once the call finishes.
+    """
+
+    def __init__(self):
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._metrics = {"calls": 0, "shared": 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run `fn()` unless an identical call is already in flight.
+
+        Args:
+            key: Fingerprint of the call (e.g. the chat cache key)
+            fn: Coroutine factory doing the actual work
+
+        Returns:
+            The shared result
+        """
+        task, _ = self.start(key, fn)
+        return await asyncio.shield(task)
+
+    def start(self, key: str, fn: Callable[[], Awaitable[Any]]) -> tuple[asyncio.Task, bool]:
+        """
+        Like `do()`, but return the task instead of awaiting it, for callers
+        that consume the work's progress while it runs (streaming).
+
+        Returns:
+            (task, started) - started is False when an identical call was
+            already in flight and `fn` was not run
+        """
+        task = self._inflight.get(key)
+        if task is not None:
+            self._metrics["shared"] += 1
+            return task, False
+        task = asyncio.ensure_future(fn())
+        self._inflight[key] = task
+        task.add_done_callback(lambda t, key=key: self._done(key, t))
+        self._metrics["calls"] += 1
+        return task, True
+
+    def stats(self) -> dict:
+        """Counters for /metrics."""
+        return {**self._metrics, "inflight": len(self._inflight)}
+
+    def _done(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception retrieved when every waiter has gone away
+        if not task.cancelled():
+            task.exception()
@@ -0,0 +1,136 @@
+"""
+PathGreen-AI: Document Watcher
+
+Polls a directory for added, edited and removed files so indexes built
+from them can be updated while the server keeps running.
+
+Each poll only stats the files; a file is read and hashed when its mtime
+or size moved, and reported when its sha256 differs from the last one
+seen (touches and no-op saves are ignored). Subscribers receive the new
+text of updated files and the paths of removed ones, and run in a worker
+thread so re-indexing never blocks the event loop.
+"""
+
+import asyncio
+import hashlib
+import logging
+from pathlib import Path
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+
+class DirectoryChanges:
+    """Files that differ from the previous scan."""
+
+    __slots__ = ("updated", "removed")
+
+    def __init__(self, updated: dict[str, str], removed: list[str]):
+        # path -> new text, for added and modified files
+        self.updated = updated
+        self.removed = removed
+
+    def __bool__(self) -> bool:
+        return bool(self.updated or self.removed)
+
+    def summary(self) -> dict:
+        return {
+            "updated": sorted(Path(path).name for path in self.updated),
+            "removed": sorted(Path(path).name for path in self.removed),
+        }
+
+
+class DirectoryWatcher:
+    """
+    Content-hash polling watcher for one directory.
+
+    Args:
+        directory: Directory to watch (may not exist yet)
+        pattern: Glob of the files to track
+        interval: Seconds between polls (<= 0 disables `run()`)
+    """
+
+    def __init__(self, directory: Path, pattern: str = "*", interval: float = 5.0):
+        self.directory = Path(directory)
+        self.pattern = pattern
+        self.interval = interval
+        # path -> ((mtime_ns, size), sha256)
+        self._files: dict[str, tuple[tuple[int, int], str]] = {}
+        self._subscribers: list[Callable[[DirectoryChanges], None]] = []
+
+        self.polls = 0
+        self.change_sets = 0
+        self.last_change: dict = {}
+
+    def subscribe(self, callback: Callable[[DirectoryChanges], None]):
+        """Call `callback(changes)` after every scan that found changes."""
+        self._subscribers.append(callback)
+
+    def scan(self) -> DirectoryChanges:
+        """
+        Compare the directory with the previous scan and remember its state.
+
+        The first scan reports every file as updated; call it once before
+        loading the files to take a baseline.
+        """
+        seen: dict[str, tuple[tuple[int, int], str]] = {}
+        updated: dict[str, str] = {}
+        for path in sorted(self.directory.glob(self.pattern)):
+            key = str(path)
+            known = self._files.get(key)
+            try:
+                stat = path.stat()
+                signature = (stat.st_mtime_ns, stat.st_size)
+                if known is not None and known[0] == signature:
+                    seen[key] = known
+                    continue
+                text = path.read_text(encoding="utf-8")
+            except FileNotFoundError:
+                continue  # removed mid-scan
+            except (OSError, UnicodeDecodeError) as e:
+                logger.warning(f"[Watcher] Skipping unreadable {path.name}: {e}")
+                if known is not None:
+                    seen[key] = known
+                continue
+
+            sha = hashlib.sha256(text.encode("utf-8")).hexdigest()
+            seen[key] = (signature, sha)
+            if known is None or known[1] != sha:
+                updated[key] = text
+
+        removed = [key for key in self._files if key not in seen]
+        self._files = seen
+        self.polls += 1
+        return DirectoryChanges(updated, removed)
+
+    def notify(self, changes: DirectoryChanges):
+        """Run every subscriber; one failing doesn't stop the others."""
+        self.change_sets += 1
+        self.last_change = changes.summary()
+        logger.info(f"[Watcher] {self.directory.name} changed: {self.last_change}")
+        for callback in self._subscribers:
+            try:
+                callback(changes)
+            except Exception as e:
+                logger.error(f"[Watcher] Subscriber {getattr(callback, '__name__', callback)} failed: {e}")
+
+    async def run(self):
+        """Poll forever (started as a background task)."""
+        logger.info(f"[Watcher] Watching {self.directory} ({self.pattern}) every {self.interval}s")
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                changes = await asyncio.to_thread(self.scan)
+                if changes:
+                    await asyncio.to_thread(self.notify, changes)
+            except Exception as e:
+                logger.error(f"[Watcher] Poll failed: {e}")
+
+    def stats(self) -> dict:
+        """Counters for /metrics."""
+        return {
+            "files": len(self._files),
+            "polls": self.polls,
+            "change_sets": self.change_sets,
+            "last_change": self.last_change,
+        }
@@ -0,0 +1,195 @@
+"""
+PathGreen-AI: Embedding Cache
+
+Content-addressed cache in front of text embedders.
+
+- EmbeddingStore: SQLite table keyed by (embedder model, sha256 of the
+  text), so a chunk is embedded once per model no matter how often the
+  corpus is re-indexed, the process restarts, or a rolling deploy starts a
+  new replica on the same volume
+- CachedEmbedder: wraps any embedder with `embed(texts)` and `model_name`;
+  document batches only embed their misses, and repeated questions hit an
+  in-memory query LRU
+"""
+
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+
+DEFAULT_QUERY_CACHE_SIZE = 1024
+
+# SQLite caps bound parameters per statement; batch lookups below that
+_LOOKUP_BATCH = 500
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# =============================================================================
+# PERSISTENT STORE
+# =============================================================================
+
+class EmbeddingStore:
+    """
+    SQLite-backed (model, content hash) -> float32 vector map.
+
+    Args:
+        db_path: SQLite file (created with its parent directory if missing)
+    """
+
+    def __init__(self, db_path: str):
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("numpy is required for the embedding cache")
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, sha256 TEXT NOT NULL, dim INTEGER NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (model, sha256))"
+        )
+
+    def get_many(self, model: str, hashes: Sequence[str]) -> dict[str, "np.ndarray"]:
+        """Cached vectors for the given content hashes (misses are absent)."""
+        found = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            for start in range(0, len(unique), _LOOKUP_BATCH):
+                batch = unique[start:start + _LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._db.execute(
+                    f"SELECT sha256, vector FROM embeddings WHERE model = ? AND sha256 IN ({placeholders})",
+                    [model, *batch],
+                ).fetchall()
+                for sha, blob in rows:
+                    found[sha] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, model: str, items: Iterable[tuple[str, "np.ndarray"]]):
+        """Store (content hash, vector) pairs; existing entries are kept."""
+        rows = [
+            (model, sha, int(vector.shape[-1]), np.asarray(vector, dtype=np.float32).tobytes())
+            for sha, vector in items
+        ]
+        if not rows:
+            return
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO embeddings (model, sha256, dim, vector) VALUES (?, ?, ?, ?)", rows
+            )
+
+    def count(self, model: Optional[str] = None) -> int:
+        with self._lock:
+            if model is None:
+                return self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            return self._db.execute("SELECT COUNT(*) FROM embeddings WHERE model = ?", (model,)).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+# =============================================================================
+# CACHING WRAPPER
+# =============================================================================
+
+class CachedEmbedder:
+    """
+    Embedder wrapper backed by an EmbeddingStore and a query LRU.
+
+    Exposes the same `embed(texts)` / `model_name` interface as the wrapped
+    embedder, so callers can swap it in transparently.
+
+    Args:
+        embedder: Object with `embed(texts) -> (n, dim) array` and `model_name`
+        store: Persistent store (None = query LRU only)
+        query_cache_size: Query vectors kept in memory
+    """
+
+    def __init__(self, embedder, store: Optional[EmbeddingStore] = None, query_cache_size: int = DEFAULT_QUERY_CACHE_SIZE):
+        self.embedder = embedder
+        self.store = store
+        self.model_name = embedder.model_name
+        self.query_cache_size = max(1, query_cache_size)
+        self._queries: OrderedDict[str, "np.ndarray"] = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.query_hits = 0
+        self.query_misses = 0
+
+    def embed(self, texts: Sequence[str]) -> "np.ndarray":
+        """
+        Embed documents, computing only those not already in the store.
+
+        Returns:
+            (len(texts), dim) float32 array in input order
+        """
+        if self.store is None:
+            self.misses += len(texts)
+            return self.embedder.embed(texts)
+
+        hashes = [content_hash(text) for text in texts]
+        cached = self.store.get_many(self.model_name, hashes)
+
+        # Embed each distinct missing text once
+        missing: dict[str, str] = {}
+        for sha, text in zip(hashes, texts):
+            if sha not in cached and sha not in missing:
+                missing[sha] = text
+        if missing:
+            vectors = self.embedder.embed(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            self.store.put_many(self.model_name, fresh.items())
+            cached.update(fresh)
+
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        if not texts:
+            return self.embedder.embed(texts)
+        return np.stack([cached[sha] for sha in hashes]).astype(np.float32, copy=False)
+
+    def embed_query(self, text: str) -> "np.ndarray":
+        """Embed one question, memoized in the in-memory LRU."""
+        with self._lock:
+            vector = self._queries.get(text)
+            if vector is not None:
+                self._queries.move_to_end(text)
+                self.query_hits += 1
+                return vector
+
+        vector = self.embedder.embed([text])[0]
+        with self._lock:
+            self.query_misses += 1
+            self._queries[text] = vector
+            while len(self._queries) > self.query_cache_size:
+                self._queries.popitem(last=False)
+        return vector
+
+    def stats(self) -> dict:
+        """Counters for /metrics."""
+        return {
+            "model": self.model_name,
+            "stored": self.store.count(self.model_name) if self.store else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "query_hits": self.query_hits,
+            "query_misses": self.query_misses,
+        }
@@ -0,0 +1,319 @@
+"""
+PathGreen-AI: Fleet Frame Codec
+
+Wire formats for /ws fleet updates.
+
+Two protocol modes are supported:
+- "full":  every tick is a FLEET_UPDATE carrying the whole fleet (default)
+- "delta": a FLEET_UPDATE keyframe on connect and every few seconds, then
+           FLEET_DELTA frames with only the vehicles and fields that changed
+
+Every frame carries a `seq` number. A delta frame applies on top of the
+frame with `seq - 1`; clients that see a gap send a KEYFRAME_REQUEST.
+
+Two encodings are negotiated through the WebSocket subprotocol header:
+- "pathgreen.json.v1" (or no subprotocol): JSON text frames
+- "pathgreen.bin.v1": fixed-layout binary frames for vehicle positions,
+  with the vehicle id table and alerts sent as small JSON text frames
+
+Binary frame layout (little-endian):
+    header   2s magic "PG", u8 version, u8 flags (bit 0 = keyframe),
+             u32 seq, f64 unix timestamp, u32 record count, u32 removed count
+    record   u32 vehicle index, f64 lat, f64 lng, f32 speed, u16 co2, u8 status
+    removed  u32 vehicle index, one per removed vehicle
+"""
+
+import json
+import struct
+import time
+from datetime import datetime
+from typing import Optional, Union
+
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+MODE_FULL = "full"
+MODE_DELTA = "delta"
+PROTOCOL_MODES = (MODE_FULL, MODE_DELTA)
+
+SUBPROTOCOL_JSON = "pathgreen.json.v1"
+SUBPROTOCOL_BINARY = "pathgreen.bin.v1"
+SUBPROTOCOLS = (SUBPROTOCOL_JSON, SUBPROTOCOL_BINARY)
+
+BINARY_MAGIC = b"PG"
+BINARY_VERSION = 1
+FLAG_KEYFRAME = 0x01
+
+HEADER = struct.Struct("<2sBBIdII")
+RECORD = struct.Struct("<IddfHB")
+REMOVED = struct.Struct("<I")
+
+STATUS_CODES = {"MOVING": 0, "IDLE": 1, "WARNING": 2, "CRITICAL": 3}
+STATUS_UNKNOWN = 255
+
+Message = Union[str, bytes]
+
+
+def _dumps(payload: dict) -> str:
+    """Compact JSON, same settings as Starlette's send_json."""
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+
+
+def negotiate_subprotocol(offered: list[str]) -> Optional[str]:
+    """
+    Pick the first supported subprotocol offered by the client.
+
+    Returns:
+        Subprotocol name, or None to fall back to plain JSON
+    """
+    for name in offered:
+        if name in SUBPROTOCOLS:
+            return name
+    return None
+
+
+# =============================================================================
+# VEHICLE INDEX
+# =============================================================================
+
+class VehicleIndex:
+    """
+    Append-only mapping of vehicle id -> small integer.
+
+    Binary frames reference vehicles by index; the table itself is sent to
+    binary clients as a VEHICLE_INDEX text frame whenever it grows.
+    """
+
+    def __init__(self):
+        self.ids: list[str] = []
+        self._positions: dict[str, int] = {}
+        self._encoded: Optional[str] = None
+
+    @property
+    def version(self) -> int:
+        return len(self.ids)
+
+    def lookup(self, vehicle_id: str) -> int:
+        """Return the index for a vehicle id, assigning one if new."""
+        position = self._positions.get(vehicle_id)
+        if position is None:
+            position = self._positions[vehicle_id] = len(self.ids)
+            self.ids.append(vehicle_id)
+            self._encoded = None
+        return position
+
+    def encode(self) -> str:
+        """VEHICLE_INDEX text frame for the current table (memoized)."""
+        if self._encoded is None:
+            self._encoded = _dumps({
+                "type": "VEHICLE_INDEX",
+                "version": self.version,
+                "ids": self.ids,
+            })
+        return self._encoded
+
+
+def _pack_record(index: int, vehicle: dict) -> bytes:
+    co2 = min(max(int(round(vehicle.get("co2") or 0)), 0), 0xFFFF)
+    return RECORD.pack(
+        index,
+        vehicle["lat"],
+        vehicle["lng"],
+        float(vehicle.get("speed") or 0.0),
+        co2,
+        STATUS_CODES.get(vehicle.get("status"), STATUS_UNKNOWN),
+    )
+
+
+# =============================================================================
+# FRAMES
+# =============================================================================
+
+class FleetFrame:
+    """
+    One broadcast tick.
+
+    Holds the full fleet state plus the delta against the previous tick.
+    Encodings are produced lazily and memoized, so a frame is serialized at
+    most once per wire format no matter how many clients receive it.
+    """
+
+    __slots__ = (
+        "seq", "created_at", "timestamp", "vehicles", "changed", "removed",
+        "alerts", "engine", "is_keyframe", "index", "_encoded",
+    )
+
+    def __init__(
+        self,
+        seq: int,
+        vehicles: list[dict],
+        changed: list[dict],
+        removed: list[str],
+        alerts: list[dict],
+        engine: str,
+        is_keyframe: bool = False,
+        index: Optional[VehicleIndex] = None,
+    ):
+        self.seq = seq
+        self.created_at = time.time()
+        self.timestamp = datetime.fromtimestamp(self.created_at).isoformat()
+        self.vehicles = vehicles
+        self.changed = changed
+        self.removed = removed
+        self.alerts = alerts
+        self.engine = engine
+        self.is_keyframe = is_keyframe
+        self.index = index
+        self._encoded: dict[tuple, Message] = {}
+
+    def keyframe_payload(self) -> dict:
+        """Full-state FLEET_UPDATE payload (backwards compatible)."""
+        return {
+            "type": "FLEET_UPDATE",
+            "seq": self.seq,
+            "keyframe": True,
+            "timestamp": self.timestamp,
+            "data": self.vehicles,
+            "alerts": self.alerts,
+            "engine": self.engine,
+        }
+
+    def delta_payload(self) -> dict:
+        """FLEET_DELTA payload relative to frame `seq - 1`."""
+        return {
+            "type": "FLEET_DELTA",
+            "seq": self.seq,
+            "base_seq": self.seq - 1,
+            "timestamp": self.timestamp,
+            "changed": self.changed,
+            "removed": self.removed,
+            "alerts": self.alerts,
+            "engine": self.engine,
+        }
+
+    def encode(self, keyframe: bool = True, binary: bool = False) -> Message:
+        """
+        Serialize the frame.
+
+        Args:
+            keyframe: True for the full-state payload, False for the delta
+            binary: True for the fixed-layout binary encoding
+
+        Returns:
+            Memoized JSON string or binary frame
+        """
+        key = ("key" if keyframe or self.is_keyframe else "delta", binary)
+        encoded = self._encoded.get(key)
+        if encoded is None:
+            if binary:
+                encoded = self._encode_binary(key[0] == "key")
+            elif key[0] == "key":
+                encoded = _dumps(self.keyframe_payload())
+            else:
+                encoded = _dumps(self.delta_payload())
+            self._encoded[key] = encoded
+        return encoded
+
+    def encode_alerts(self) -> Optional[str]:
+        """ALERTS text frame accompanying binary frames, if any alerts fired."""
+        if not self.alerts:
+            return None
+        key = ("alerts", False)
+        encoded = self._encoded.get(key)
+        if encoded is None:
+            encoded = self._encoded[key] = _dumps({
+                "type": "ALERTS",
+                "seq": self.seq,
+                "alerts": self.alerts,
+            })
+        return encoded
+
+    def _encode_binary(self, keyframe: bool) -> bytes:
+        lookup = self.index.lookup
+        if keyframe:
+            records = self.vehicles
+            removed = []
+        else:
+            by_id = {v["id"]: v for v in self.vehicles}
+            records = [by_id[c["id"]] for c in self.changed]
+            removed = self.removed
+
+        parts = [HEADER.pack(
+            BINARY_MAGIC,
+            BINARY_VERSION,
+            FLAG_KEYFRAME if keyframe else 0,
+            self.seq,
+            self.created_at,
+            len(records),
+            len(removed),
+        )]
+        parts.extend(_pack_record(lookup(v["id"]), v) for v in records)
+        parts.extend(REMOVED.pack(lookup(vid)) for vid in removed)
+        return b"".join(parts)
+
+
+# =============================================================================
+# DELTA ENCODER
+# =============================================================================
+
+class DeltaEncoder:
+    """
+    Turns successive fleet snapshots into sequenced FleetFrames.
+
+    Remembers the last broadcast state per vehicle and diffs each new tick
+    against it field by field. Every `keyframe_every` ticks the frame is
+    flagged as a keyframe so delta clients periodically resynchronize.
+    """
+
+    def __init__(self, keyframe_every: int = 20, index: Optional[VehicleIndex] = None):
+        self.keyframe_every = max(1, keyframe_every)
+        self.seq = 0
+        self.index = index or VehicleIndex()
+        self._last: dict[str, dict] = {}
+
+    def next_frame(self, vehicles: list[dict], alerts: list[dict], engine: str) -> FleetFrame:
+        """
+        Build the frame for the next tick.
+
+        Args:
+            vehicles: Current vehicle dicts (must not be mutated afterwards)
+            alerts: Alerts raised during this tick
+            engine: "pathway" or "simulator"
+
+        Returns:
+            FleetFrame with full state and per-field changes
+        """
+        self.seq += 1
+        current: dict[str, dict] = {}
+        changed = []
+
+        for vehicle in vehicles:
+            vid = vehicle["id"]
+            current[vid] = vehicle
+            self.index.lookup(vid)
+            previous = self._last.get(vid)
+
+            if previous is None:
+                changed.append(vehicle)
+                continue
+
+            diff = {k: v for k, v in vehicle.items() if previous.get(k) != v}
+            if diff:
+                diff["id"] = vid
+                changed.append(diff)
+
+        removed = [vid for vid in self._last if vid not in current]
+        self._last = current
+
+        return FleetFrame(
+            seq=self.seq,
+            vehicles=vehicles,
+            changed=changed,
+            removed=removed,
+            alerts=alerts,
+            engine=engine,
+            is_keyframe=self.seq % self.keyframe_every == 0,
+            index=self.index,
+        )
@@ -0,0 +1,235 @@
+"""
+PathGreen-AI: Fleet Context Builder
+
+Compact, token-budgeted fleet context for LLM prompts.
+
+Aggregates (counts by status, top emitters, active alerts) are refreshed
+once per tick from the fleet store, so a chat request only formats a few
+precomputed lines instead of one line per vehicle. Vehicles named in the
+question get full detail first; the remaining sections are added in
+relevance order until the token budget runs out.
+"""
+
+import heapq
+from collections import Counter
+from typing import Iterable, Optional
+
+from chat_cache import mentioned_vehicle_ids
+
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+DEFAULT_TOKEN_BUDGET = 600
+DEFAULT_TOP_K = 5
+DEFAULT_MAX_ALERTS = 10
+
+# Statuses for which a vehicle's last alert is still relevant
+ALERT_STATUSES = ("WARNING", "CRITICAL")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token)."""
+    return (len(text) + 3) // 4
+
+
+def format_vehicle(vehicle: dict) -> str:
+    """One detailed line for a vehicle."""
+    line = (
+        f"{vehicle['id']}: {vehicle.get('status', '?')} at "
+        f"({vehicle.get('lat', 0):.4f}, {vehicle.get('lng', 0):.4f}), CO₂={vehicle.get('co2', 0)}g"
+    )
+    if vehicle.get("speed") is not None:
+        line += f", speed={vehicle['speed']:.0f} km/h"
+    if vehicle.get("idle_seconds"):
+        line += f", idle={int(vehicle['idle_seconds'])}s"
+    return line
+
+
+def format_alert(alert: dict) -> str:
+    return f"{alert['vehicle_id']}: {alert.get('severity', '?')} {alert.get('type', '?')} - {alert.get('message', '')}"
+
+
+class FleetContextBuilder:
+    """
+    Per-tick fleet aggregates rendered into a bounded prompt section.
+
+    Args:
+        token_budget: Default max tokens for `build()`
+        top_k: Emitters listed in the summary
+        max_alerts: Active alerts listed in the summary
+    """
+
+    def __init__(
+        self,
+        token_budget: int = DEFAULT_TOKEN_BUDGET,
+        top_k: int = DEFAULT_TOP_K,
+        max_alerts: int = DEFAULT_MAX_ALERTS,
+    ):
+        self.token_budget = token_budget
+        self.top_k = top_k
+        self.max_alerts = max_alerts
+
+        self.version = -1
+        self.vehicles: dict[str, dict] = {}
+        self.status_counts: Counter = Counter()
+        self.active_alerts: dict[str, dict] = {}
+        self.total_co2 = 0
+
+        self._statuses: dict[str, str] = {}
+        self._co2: dict[str, int] = {}
+        self._sections: list[str] = []
+
+    # -------------------------------------------------------------------------
+    # Per-tick update
+    # -------------------------------------------------------------------------
+
+    def update(
+        self,
+        vehicles: dict[str, dict],
+        alerts: Iterable[dict] = (),
+        changed: Optional[Iterable[str]] = None,
+        version: Optional[int] = None,
+    ):
+        """
+        Fold one fleet update into the aggregates.
+
+        Args:
+            vehicles: vehicle_id -> latest vehicle dict (treated as immutable)
+            alerts: Alerts raised since the previous update
+            changed: Ids that changed since the previous update (None = all)
+            version: Store version, recorded for staleness checks
+        """
+        self.vehicles = vehicles
+        if version is not None:
+            self.version = version
+
+        ids = vehicles.keys() if changed is None else changed
+        statuses, co2 = self._statuses, self._co2
+        for vid in ids:
+            vehicle = vehicles.get(vid)
+            if vehicle is None:
+                continue
+            old_status = statuses.get(vid)
+            new_status = vehicle.get("status", "UNKNOWN")
+            if old_status != new_status:
+                if old_status is not None:
+                    self.status_counts[old_status] -= 1
+                self.status_counts[new_status] += 1
+                statuses[vid] = new_status
+            new_co2 = vehicle.get("co2") or 0
+            self.total_co2 += new_co2 - co2.get(vid, 0)
+            co2[vid] = new_co2
+
+        for alert in alerts:
+            self.active_alerts[alert["vehicle_id"]] = alert
+        # An alert stays active only while its vehicle is still flagged
+        for vid in [v for v in self.active_alerts if statuses.get(v) not in ALERT_STATUSES]:
+            del self.active_alerts[vid]
+
+        self._sections = self._render_sections()
+
+    def _render_sections(self) -> list[str]:
+        """Summary sections in relevance order (rendered once per tick)."""
+        count = len(self.vehicles)
+        if not count:
+            return []
+
+        counts = ", ".join(f"{status}={n}" for status, n in sorted(self.status_counts.items()) if n)
+        summary = (
+            f"Fleet: {count} vehicles ({counts}); "
+            f"avg CO₂={self.total_co2 / count:.0f}g"
+        )
+
+        sections = [summary]
+
+        if self.active_alerts:
+            recent = list(self.active_alerts.values())[-self.max_alerts:]
+            lines = [format_alert(a) for a in reversed(recent)]
+            extra = len(self.active_alerts) - len(recent)
+            if extra:
+                lines.append(f"... and {extra} more active alerts")
+            sections.append("Active alerts:\n" + "\n".join(lines))
+
+        top = heapq.nlargest(self.top_k, self._co2.items(), key=lambda item: item[1])
+        if top:
+            sections.append(
+                f"Top {len(top)} emitters:\n"
+                + "\n".join(format_vehicle(self.vehicles[vid]) for vid, _ in top if vid in self.vehicles)
+            )
+        return sections
+
+    # -------------------------------------------------------------------------
+    # Per-request rendering
+    # -------------------------------------------------------------------------
+
+    def build(self, query: str = "", token_budget: Optional[int] = None) -> str:
+        """
+        Fleet context for one question, within the token budget.
+
+        Args:
+            query: User question; vehicles it names get full detail
+            token_budget: Override the default budget
+
+        Returns:
+            Prompt-ready text (empty if nothing fits)
+        """
+        budget = self.token_budget if token_budget is None else token_budget
+        blocks: list[str] = []
+        used = 0
+
+        def add(text: str) -> bool:
+            nonlocal used
+            cost = estimate_tokens(text) + 1
+            if used + cost > budget:
+                return False
+            blocks.append(text)
+            used += cost
+            return True
+
+        ids = mentioned_vehicle_ids(query)
+        if ids:
+            lines = []
+            for vid in ids:
+                vehicle = self.vehicles.get(vid)
+                if vehicle is None:
+                    lines.append(f"{vid}: not in the current fleet")
+                    continue
+                lines.append(format_vehicle(vehicle))
+                if vid in self.active_alerts:
+                    lines.append(f"  alert: {format_alert(self.active_alerts[vid])}")
+            # Mentioned vehicles are the most relevant; trim them last
+            header = "Vehicles in question:"
+            while lines and not add("\n".join([header] + lines)):
+                lines.pop()
+
+        for section in self._sections:
+            if not add(section):
+                # Keep whatever whole lines of the section still fit
+                head, *rest = section.split("\n")
+                partial = [head]
+                for line in rest:
+                    if estimate_tokens("\n".join(partial + [line])) + 1 + used > budget:
+                        break
+                    partial.append(line)
+                if len(partial) > 1:
+                    add("\n".join(partial))
+                break
+
+        return "\n\n".join(blocks)
+
+
+def render_fleet_context(
+    query: str,
+    vehicles: Optional[dict] = None,
+    alerts: Optional[Iterable[dict]] = None,
+    token_budget: int = DEFAULT_TOKEN_BUDGET,
+) -> str:
+    """One-off context for callers without a per-tick builder (e.g. LLMHandler)."""
+    builder = FleetContextBuilder(token_budget=token_budget)
+    by_id = {}
+    for vid, state in (vehicles or {}).items():
+        by_id[vid] = {"id": vid, **state} if isinstance(state, dict) else {"id": vid, "status": str(state)}
+    builder.update(by_id, [a for a in (alerts or []) if isinstance(a, dict) and "vehicle_id" in a])
+    return builder.build(query)
@@ -0,0 +1,358 @@
+"""
+PathGreen-AI: Prompt Injection Guard
+
+Cheap screening of chat queries against prompt-injection rules.
+
+Every rule lists literal trigger words, at least one of which appears in
+any text the rule can match. A query is first checked for triggers with
+plain substring tests; the common benign case contains none and never
+touches a regex. Each trigger's rules are precompiled into one
+alternation (a named group per rule), so a trigger hit costs a single
+search; rules without triggers share an alternation scanned on every
+query.
+Extra rules are loaded from JSON rule packs.
+
+Rule pack format:
+    {"name": "pack-name",
+     "rules": [{"name": "rule_name", "pattern": "<regex>", "triggers": ["word", ...]}]}
+
+Patterns are matched against the lowercased query. Trigger lists are
+checked when the guard is built: sample strings are generated from each
+pattern (every alternative at least once), and a rule that matches a
+sample containing none of its triggers is logged and scanned on every
+query instead, so an incomplete list never silently disables a rule.
+Samples come from the stdlib's internal regex parser; where it can't be
+imported the check is skipped (with a warning) and triggers are trusted.
+"""
+
+import json
+import logging
+import os
+import re
+import warnings
+from collections import Counter
+from itertools import product
+from pathlib import Path
+from typing import Iterable, Optional
+
+# The regex parser is private; without it trigger lists go unverified
+try:
+    from re import _parser as _sre_parse  # Python 3.11+
+    SRE_PARSE_AVAILABLE = True
+except ImportError:
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)
+            import sre_parse as _sre_parse
+        SRE_PARSE_AVAILABLE = True
+    except ImportError:
+        _sre_parse = None
+        SRE_PARSE_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Cap on sample strings generated per rule when checking its triggers
+MAX_TRIGGER_SAMPLES = 256
+
+
+# =============================================================================
+# RULES
+# =============================================================================
+
+class InjectionRule:
+    """One named pattern plus the literals that must appear for it to match."""
+
+    __slots__ = ("name", "pattern", "triggers")
+
+    def __init__(self, name: str, pattern: str, triggers: Iterable[str] = ()):
+        compiled = re.compile(pattern)
+        if compiled.groupindex:
+            raise ValueError(f"Injection rule '{name}' may not use named groups")
+        self.name = name
+        self.pattern = pattern
+        self.triggers = tuple(t.lower() for t in triggers)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "InjectionRule":
+        try:
+            return cls(data["name"], data["pattern"], data.get("triggers", ()))
+        except re.error as e:
+            raise ValueError(f"Injection rule '{data.get('name')}' has an invalid pattern: {e}") from None
+
+
+# Built-in rules (previously INJECTION_PATTERNS in main.py)
+DEFAULT_RULES = [
+    InjectionRule(
+        "ignore_instructions",
+        r"ignore\s+(previous|all|above|prior)\s+(instructions?|prompts?|rules?)",
+        ["ignore"],
+    ),
+    InjectionRule(
+        "reveal_internals",
+        r"reveal\s+(system|internal|secret|hidden)\s+(prompt|instructions?|key|config)",
+        ["reveal"],
+    ),
+    InjectionRule(
+        "print_system_prompt",
+        r"(show|print|display|output)\s+(system\s+prompt|instructions|config)",
+        ["system", "instructions", "config"],
+    ),
+    InjectionRule(
+        "no_restrictions",
+        r"act\s+as\s+if\s+you\s+have\s+no\s+restrictions",
+        ["restrictions"],
+    ),
+    InjectionRule(
+        "pretend_not_ai",
+        r"pretend\s+you\s+are\s+(not|no\s+longer)\s+(an?\s+)?ai",
+        ["pretend"],
+    ),
+    InjectionRule(
+        "ask_system_prompt",
+        r"(what|show|reveal)\s+(is|are)\s+your\s+(system|initial)\s+(prompt|instructions)",
+        ["your"],
+    ),
+    InjectionRule("sudo", r"\bsudo\b", ["sudo"]),
+    InjectionRule(
+        "credentials",
+        r"\b(api.?key|secret.?key|password|credentials|connection.?string)\b",
+        ["key", "password", "credentials", "connection"],
+    ),
+]
+
+
+# =============================================================================
+# TRIGGER CHECK
+# =============================================================================
+
+_CATEGORY_SAMPLES = {
+    "CATEGORY_DIGIT": "0",
+    "CATEGORY_NOT_DIGIT": "a",
+    "CATEGORY_SPACE": " ",
+    "CATEGORY_NOT_SPACE": "a",
+    "CATEGORY_WORD": "a",
+    "CATEGORY_NOT_WORD": " ",
+}
+
+
+def _combine(options: list[list[str]], limit: int) -> list[str]:
+    """
+    Concatenations of one option per position: the full product when it
+    is small, else a diagonal that still uses every option once.
+    """
+    if not options:
+        return [""]
+    total = 1
+    for choices in options:
+        total *= len(choices)
+    if total <= limit:
+        return ["".join(parts) for parts in product(*options)]
+    width = max(len(choices) for choices in options)
+    return ["".join(choices[i % len(choices)] for choices in options) for i in range(min(width, limit))]
+
+
+def _expand(tree, limit: int) -> list[str]:
+    """Sample strings for a parsed regex (approximate; callers re-check with the regex)."""
+    options = []
+    for op, av in tree:
+        name = op.name
+        if name == "LITERAL":
+            choices = [chr(av)]
+        elif name == "NOT_LITERAL":
+            choices = ["b" if chr(av) == "a" else "a"]
+        elif name == "ANY":
+            choices = ["a"]
+        elif name == "IN":
+            choices = []
+            for item_op, item_av in av:
+                if item_op.name == "LITERAL":
+                    choices.append(chr(item_av))
+                elif item_op.name == "RANGE":
+                    choices.append(chr(item_av[0]))
+                elif item_op.name == "CATEGORY":
+                    choices.append(_CATEGORY_SAMPLES.get(item_av.name, "a"))
+            choices = list(dict.fromkeys(choices)) or ["a"]
+        elif name == "CATEGORY":
+            choices = [_CATEGORY_SAMPLES.get(av.name, "a")]
+        elif name == "BRANCH":
+            choices = [sample for branch in av[1] for sample in _expand(branch, limit)][:limit]
+        elif name == "SUBPATTERN":
+            choices = _expand(av[-1], limit)
+        elif name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT"):
+            low, high, item = av
+            inner = _expand(item, limit)
+            counts = {low, min(low + 1, high)}
+            choices = [sample * count for count in sorted(counts) for sample in inner][:limit]
+        else:
+            choices = [""]  # anchors, lookarounds, backreferences
+        options.append(choices or [""])
+    return _combine(options, limit)
+
+
+def pattern_samples(pattern: str, limit: int = MAX_TRIGGER_SAMPLES) -> list[str]:
+    """
+    Sample strings covering every alternative of a regex, or [] when the
+    parser is unavailable or returns a tree this walker doesn't know.
+    """
+    if not SRE_PARSE_AVAILABLE:
+        return []
+    try:
+        return _expand(_sre_parse.parse(pattern), limit)
+    except Exception as e:
+        logger.debug(f"[Guard] Can't generate samples for {pattern!r}: {e}")
+        return []
+
+
+def untriggered_sample(rule: "InjectionRule", limit: int = MAX_TRIGGER_SAMPLES) -> Optional[str]:
+    """
+    A string the rule's pattern matches that contains none of its triggers,
+    or None if no generated sample does (the trigger list looks complete).
+    """
+    compiled = re.compile(rule.pattern)
+    for sample in pattern_samples(rule.pattern, limit):
+        lowered = sample.lower()
+        if compiled.search(lowered) and not any(trigger in lowered for trigger in rule.triggers):
+            return lowered
+    return None
+
+
+def load_rule_pack(path) -> list[InjectionRule]:
+    """
+    Read rules from a JSON rule pack.
+
+    Raises:
+        ValueError: Malformed pack or invalid rule
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    rules = data.get("rules") if isinstance(data, dict) else data
+    if not isinstance(rules, list):
+        raise ValueError(f"Rule pack {path} has no 'rules' list")
+    return [InjectionRule.from_dict(rule) for rule in rules]
+
+
+# =============================================================================
+# GUARD
+# =============================================================================
+
+class InjectionGuard:
+    """
+    Compiled rule set.
+
+    `check()` costs one substring test per trigger word plus one search of
+    each present trigger's combined rules, so adding rule packs keeps
+    benign queries cheap and stops a malicious one at its first trigger.
+
+    Args:
+        rules: Rules to enforce (names must be unique)
+    """
+
+    def __init__(self, rules: Iterable[InjectionRule]):
+        self.rules = list(rules)
+        names = [rule.name for rule in self.rules]
+        if len(set(names)) != len(names):
+            raise ValueError("Injection rule names must be unique")
+
+        # trigger -> rule indices it selects; triggers checked in one flat loop
+        selects: dict[str, list[int]] = {}
+        untriggered = []
+        self.unreliable_triggers: list[str] = []
+        if not SRE_PARSE_AVAILABLE:
+            logger.warning("[Guard] Regex parser unavailable; trigger lists are not verified")
+        for i, rule in enumerate(self.rules):
+            if rule.triggers:
+                sample = untriggered_sample(rule)
+                if sample is not None:
+                    logger.warning(
+                        f"[Guard] Rule '{rule.name}' matches {sample!r} without any of its triggers "
+                        f"{list(rule.triggers)}; checking it on every query"
+                    )
+                    self.unreliable_triggers.append(rule.name)
+                    untriggered.append(i)
+                    continue
+                for trigger in rule.triggers:
+                    selects.setdefault(trigger, []).append(i)
+            else:
+                untriggered.append(i)
+
+        # One named group per rule; group names must be identifiers, rule
+        # names are free-form. Triggers selecting the same rules share a
+        # pattern, and rules that can't be prefiltered share one pass
+        self._group_names = {f"r{i}": rule.name for i, rule in enumerate(self.rules)}
+        combined: dict[tuple[int, ...], re.Pattern] = {}
+        triggers = []
+        for trigger, indices in selects.items():
+            key = tuple(indices)
+            if key not in combined:
+                combined[key] = self._alternation(key)
+            triggers.append((trigger, combined[key]))
+        self._triggers = tuple(triggers)
+        self._always = self._alternation(untriggered)
+
+        self.checks = 0
+        self.prefiltered = 0
+        self.blocked: Counter = Counter()
+
+    def _alternation(self, indices: Iterable[int]) -> Optional[re.Pattern]:
+        parts = [f"(?P<r{i}>{self.rules[i].pattern})" for i in indices]
+        return re.compile("|".join(parts)) if parts else None
+
+    @classmethod
+    def from_packs(cls, paths: Iterable = (), include_defaults: bool = True) -> "InjectionGuard":
+        """Built-in rules plus every rule in the given JSON packs."""
+        rules = list(DEFAULT_RULES) if include_defaults else []
+        for path in paths:
+            pack = load_rule_pack(path)
+            logger.info(f"[Guard] Loaded {len(pack)} injection rules from {Path(path).name}")
+            rules.extend(pack)
+        return cls(rules)
+
+    @classmethod
+    def from_env(cls) -> "InjectionGuard":
+        """Built-in rules plus packs listed in INJECTION_RULE_PACKS (comma-separated paths)."""
+        paths = [p.strip() for p in os.getenv("INJECTION_RULE_PACKS", "").split(",") if p.strip()]
+        return cls.from_packs(paths)
+
+    def check(self, text: str) -> Optional[str]:
+        """
+        Screen one query.
+
+        Returns:
+            Name of a matching rule (triggered rules first, in trigger
+            order), or None if clean
+        """
+        self.checks += 1
+        lowered = text.lower()
+
+        triggered = False
+        for trigger, combined in self._triggers:
+            if trigger in lowered:
+                triggered = True
+                match = combined.search(lowered)
+                if match is not None:
+                    return self._match(match)
+
+        if self._always is None:
+            if not triggered:
+                self.prefiltered += 1
+            return None
+        match = self._always.search(lowered)
+        return self._match(match) if match is not None else None
+
+    def _match(self, match: re.Match) -> str:
+        # The rule's own group is the outermost one, so it closes last
+        return self._block(self._group_names[match.lastgroup])
+
+    def _block(self, name: str) -> str:
+        self.blocked[name] += 1
+        return name
+
+    def stats(self) -> dict:
+        """Counters for /metrics."""
+        return {
+            "rules": len(self.rules),
+            "unreliable_triggers": self.unreliable_triggers,
+            "checks": self.checks,
+            "prefiltered": self.prefiltered,
+            "blocked": dict(self.blocked),
+        }
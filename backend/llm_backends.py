@@ -0,0 +1,245 @@
+"""
+PathGreen-AI: LLM Backends
+
+One interface for every text-generation provider used by the chat path.
+
+- GeminiBackend: Google Gemini through google-generativeai (configured once
+  per process, shared by main.py and llm_handler.py)
+- FakeLLMBackend: deterministic in-process stand-in with configurable
+  latency distribution, token streaming and error injection, for offline
+  load tests and benchmarks
+
+The backend is chosen with LLM_BACKEND ("gemini", "fake" or "none"); by
+default Gemini is used when GEMINI_API_KEY is set.
+"""
+
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import random
+import re
+from typing import AsyncIterator, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    import google.generativeai as genai
+    GENAI_AVAILABLE = True
+except ImportError:
+    GENAI_AVAILABLE = False
+
+
+# =============================================================================
+# INTERFACE
+# =============================================================================
+
+class LLMBackendError(Exception):
+    """A backend failed to produce a response."""
+
+
+class LLMBackend:
+    """
+    Base class for text-generation backends.
+
+    Subclasses implement `generate` and `stream`; both take the full prompt.
+    """
+
+    name = "base"
+    model_name = ""
+
+    async def generate(self, prompt: str) -> str:
+        """Complete response text for a prompt."""
+        raise NotImplementedError
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        """Response text chunks as they are produced."""
+        raise NotImplementedError
+        yield  # pragma: no cover
+
+
+# =============================================================================
+# GEMINI
+# =============================================================================
+
+_genai_configured_key: Optional[str] = None
+
+
+class GeminiBackend(LLMBackend):
+    """
+    Google Gemini via the async google-generativeai client.
+
+    Args:
+        api_key: Gemini API key
+        model_name: Gemini model id
+    """
+
+    name = "gemini"
+
+    def __init__(self, api_key: str, model_name: str = "gemini-2.5-flash"):
+        global _genai_configured_key
+        if not GENAI_AVAILABLE:
+            raise LLMBackendError("google-generativeai is not installed")
+        if _genai_configured_key != api_key:
+            genai.configure(api_key=api_key)
+            _genai_configured_key = api_key
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+
+    async def generate(self, prompt: str) -> str:
+        response = await self.model.generate_content_async(prompt)
+        return response.text
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        response = await self.model.generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+
+# =============================================================================
+# FAKE
+# =============================================================================
+
+_QUESTION_RE = re.compile(r"### USER QUESTION ###\s*(.*?)\s*### END USER QUESTION ###", re.DOTALL)
+
+
+class FakeLLMBackend(LLMBackend):
+    """
+    Deterministic in-process LLM stand-in.
+
+    Response text depends only on the prompt. Latency is drawn from a
+    log-normal distribution (sigma 0 = fixed), so tail behaviour of our own
+    code can be measured against a known provider profile.
+
+    Args:
+        latency_ms: Median time to first token
+        latency_sigma: Log-normal shape (0 = always `latency_ms`)
+        tokens_per_second: Streaming speed after the first token
+        error_rate: Probability a call raises LLMBackendError
+        hang_rate: Probability a call never answers (exercises deadlines)
+        seed: RNG seed for reproducible runs
+    """
+
+    name = "fake"
+    model_name = "fake-llm"
+
+    def __init__(
+        self,
+        latency_ms: float = 800.0,
+        latency_sigma: float = 0.5,
+        tokens_per_second: float = 50.0,
+        error_rate: float = 0.0,
+        hang_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+        self.rng = random.Random(seed)
+        self.calls = 0
+
+    @classmethod
+    def from_env(cls) -> "FakeLLMBackend":
+        seed = os.getenv("FAKE_LLM_SEED")
+        return cls(
+            latency_ms=float(os.getenv("FAKE_LLM_LATENCY_MS", "800")),
+            latency_sigma=float(os.getenv("FAKE_LLM_LATENCY_SIGMA", "0.5")),
+            tokens_per_second=float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "50")),
+            error_rate=float(os.getenv("FAKE_LLM_ERROR_RATE", "0")),
+            hang_rate=float(os.getenv("FAKE_LLM_HANG_RATE", "0")),
+            seed=int(seed) if seed else None,
+        )
+
+    def reply_for(self, prompt: str) -> str:
+        """Deterministic answer text for a prompt."""
+        match = _QUESTION_RE.search(prompt)
+        question = (match.group(1) if match else prompt[-200:]).strip()
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+        return (
+            f"**Fake answer {digest}**\n\n"
+            f"- Question: {question}\n"
+            f"- Prompt size: {len(prompt)} characters\n"
+            f"- This response was generated locally without calling a provider."
+        )
+
+    def _first_token_delay(self) -> float:
+        if self.latency_sigma <= 0:
+            return self.latency_ms / 1000
+        return self.rng.lognormvariate(math.log(max(self.latency_ms, 1e-3)), self.latency_sigma) / 1000
+
+    async def _begin(self):
+        """Simulate provider behaviour up to the first token."""
+        self.calls += 1
+        roll = self.rng.random()
+        delay = self._first_token_delay()
+        if roll < self.hang_rate:
+            await asyncio.Event().wait()
+        await asyncio.sleep(delay)
+        if roll < self.hang_rate + self.error_rate:
+            raise LLMBackendError("Injected fake LLM error (503)")
+
+    async def generate(self, prompt: str) -> str:
+        await self._begin()
+        text = self.reply_for(prompt)
+        if self.tokens_per_second > 0:
+            await asyncio.sleep(len(text.split()) / self.tokens_per_second)
+        return text
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        await self._begin()
+        words = self.reply_for(prompt).split(" ")
+        delay = 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(delay)
+            yield word if i == len(words) - 1 else word + " "
+
+
+# =============================================================================
+# SELECTION
+# =============================================================================
+
+_backend: Optional[LLMBackend] = None
+_backend_loaded = False
+
+
+def create_backend(kind: Optional[str] = None) -> Optional[LLMBackend]:
+    """
+    Build the backend named by `kind` (default: LLM_BACKEND env).
+
+    Returns:
+        The backend, or None when no LLM is configured (callers use mocks)
+    """
+    api_key = os.getenv("GEMINI_API_KEY")
+    if api_key == "your_gemini_api_key_here":
+        api_key = None
+    kind = (kind or os.getenv("LLM_BACKEND") or ("gemini" if api_key else "none")).lower()
+
+    if kind == "fake":
+        logger.info("[LLM] Using fake in-process backend")
+        return FakeLLMBackend.from_env()
+    if kind == "gemini":
+        if not api_key:
+            logger.warning("[LLM] LLM_BACKEND=gemini but GEMINI_API_KEY is not set")
+            return None
+        try:
+            return GeminiBackend(api_key, os.getenv("GEMINI_MODEL", "gemini-2.5-flash"))
+        except Exception as e:
+            logger.error(f"[LLM] Gemini initialization failed: {e}")
+            return None
+    if kind != "none":
+        logger.warning(f"[LLM] Unknown LLM_BACKEND '{kind}', running without an LLM")
+    return None
+
+
+def get_backend() -> Optional[LLMBackend]:
+    """Process-wide backend, created on first use."""
+    global _backend, _backend_loaded
+    if not _backend_loaded:
+        _backend = create_backend()
+        _backend_loaded = True
+    return _backend
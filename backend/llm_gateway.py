@@ -0,0 +1,494 @@
+"""
+PathGreen-AI: LLM Gateway
+
+Shared admission control in front of every LLM call.
+
+- Max concurrency: at most N calls in flight against the provider
+- Token bucket: a sustained requests-per-minute limit with bursts
+- Priority classes: queued interactive chat is admitted before background work
+  (alert narration), FIFO within a class
+- Queue deadlines: a call that can't start in time raises LLMQueueTimeout
+  so the caller can answer with the mock response instead of hanging
+- Request deadlines: a call that doesn't finish in time raises
+  LLMDeadlineExceeded; a slow call gets a hedged second attempt if a slot is
+  free, and whichever answers first wins
+- Circuit breaker: after consecutive provider failures calls are refused
+  (LLMCircuitOpen) until a probe succeeds, so nobody waits on a dead backend
+
+All give-up paths raise an LLMDegraded subclass; callers catch that one type
+and answer with their mock response.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from collections import Counter
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_BACKGROUND: "background",
+}
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_RATE_PER_MINUTE = float(os.getenv("LLM_RATE_PER_MINUTE", "60"))
+LLM_BURST = int(os.getenv("LLM_BURST", "10"))
+
+# Max seconds a call may wait for admission, per priority class
+LLM_QUEUE_TIMEOUTS = {
+    PRIORITY_INTERACTIVE: float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "5")),
+    PRIORITY_BACKGROUND: float(os.getenv("LLM_BACKGROUND_QUEUE_TIMEOUT_SECONDS", "60")),
+}
+
+
+# Max seconds for a whole call (queueing + generation), per priority class
+LLM_DEADLINES = {
+    PRIORITY_INTERACTIVE: float(os.getenv("LLM_DEADLINE_SECONDS", "15")),
+    PRIORITY_BACKGROUND: float(os.getenv("LLM_BACKGROUND_DEADLINE_SECONDS", "120")),
+}
+
+# Start a hedged second attempt after this many seconds (0 = never)
+LLM_HEDGE_AFTER = {
+    PRIORITY_INTERACTIVE: float(os.getenv("LLM_HEDGE_AFTER_SECONDS", "6")),
+    PRIORITY_BACKGROUND: 0.0,
+}
+
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+
+
+class LLMDegraded(Exception):
+    """The gateway gave up on a call; the caller should use its fallback."""
+
+    reason = "degraded"
+
+
+class LLMQueueTimeout(LLMDegraded):
+    """A call could not be admitted before its queue deadline."""
+
+    reason = "queue_timeout"
+
+
+class LLMDeadlineExceeded(LLMDegraded):
+    """A call did not complete before its request deadline."""
+
+    reason = "deadline"
+
+
+class LLMCircuitOpen(LLMDegraded):
+    """The circuit breaker is open; the provider is considered down."""
+
+    reason = "circuit_open"
+
+
+# =============================================================================
+# RATE LIMIT
+# =============================================================================
+
+class TokenBucket:
+    """
+    Classic token bucket.
+
+    Args:
+        rate: Tokens added per second (<= 0 disables the limit)
+        burst: Bucket capacity
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self._updated = time.monotonic()
+
+    def take(self) -> float:
+        """
+        Take a token if one is available.
+
+        Returns:
+            0 on success, else seconds until the next token
+        """
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+# =============================================================================
+# CIRCUIT BREAKER
+# =============================================================================
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    closed -> open after `failure_threshold` failures in a row;
+    open -> half_open once `reset_timeout` has passed, letting a single probe
+    call through; the probe's outcome closes or re-opens the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURES, reset_timeout: float = LLM_BREAKER_RESET_SECONDS):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.trips = 0
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go to the provider now."""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self._probing = False
+        self._state = self.CLOSED
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self._state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self._state != self.OPEN:
+                self.trips += 1
+                logger.warning(f"[LLM] Circuit breaker opened after {self.failures} failures")
+            self._state = self.OPEN
+            self._opened_at = time.monotonic()
+
+    def record_abandoned(self):
+        """A call ended without an outcome (e.g. cancelled); free the probe."""
+        self._probing = False
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "trips": self.trips,
+        }
+
+
+# =============================================================================
+# GATEWAY
+# =============================================================================
+
+class LLMGateway:
+    """
+    Priority-ordered concurrency limiter plus rate limit for LLM calls.
+
+    Args:
+        max_concurrency: Calls allowed in flight at once
+        rate_per_minute: Sustained admission rate (<= 0 = unlimited)
+        burst: Calls that may be admitted back-to-back above the rate
+        queue_timeouts: Priority -> max seconds to wait for admission
+        deadlines: Priority -> max seconds for a whole call
+        hedge_after: Priority -> seconds before a hedged attempt (0 = off)
+        breaker: Circuit breaker shared by all calls
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        rate_per_minute: float = LLM_RATE_PER_MINUTE,
+        burst: int = LLM_BURST,
+        queue_timeouts: Optional[dict[int, float]] = None,
+        deadlines: Optional[dict[int, float]] = None,
+        hedge_after: Optional[dict[int, float]] = None,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.bucket = TokenBucket(rate_per_minute / 60.0, burst)
+        self.queue_timeouts = queue_timeouts or dict(LLM_QUEUE_TIMEOUTS)
+        self.deadlines = deadlines or dict(LLM_DEADLINES)
+        self.hedge_after = hedge_after or dict(LLM_HEDGE_AFTER)
+        self.breaker = breaker or CircuitBreaker()
+
+        self._active = 0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+
+        self._metrics = {
+            name: {"admitted": 0, "queue_timeouts": 0, "queue_ms_max": 0.0}
+            for name in PRIORITY_NAMES.values()
+        }
+        self._requests = 0
+        self._fallbacks: Counter = Counter()
+        self._hedges = {"launched": 0, "won": 0}
+
+    # -------------------------------------------------------------------------
+    # Public API
+    # -------------------------------------------------------------------------
+
+    def deadline_for(self, priority: int) -> float:
+        """Default request deadline (seconds) for a priority class."""
+        return self.deadlines.get(priority, 30.0)
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        priority: int = PRIORITY_INTERACTIVE,
+        queue_timeout: Optional[float] = None,
+    ) -> AsyncIterator[None]:
+        """
+        Hold one admission slot for the duration of the block (e.g. a stream).
+
+        The block's outcome feeds the circuit breaker; the caller enforces
+        its own deadline (raise LLMDeadlineExceeded to report one).
+
+        Raises:
+            LLMCircuitOpen: If the breaker refuses the call
+            LLMQueueTimeout: If the slot isn't granted within the queue deadline
+        """
+        self._requests += 1
+        try:
+            if not self.breaker.allow():
+                raise LLMCircuitOpen("LLM circuit breaker is open")
+            try:
+                await self._admit(priority, queue_timeout)
+            except BaseException:
+                self.breaker.record_abandoned()
+                raise
+            try:
+                yield
+            except Exception:
+                self.breaker.record_failure()
+                raise
+            except BaseException:
+                self.breaker.record_abandoned()
+                raise
+            else:
+                self.breaker.record_success()
+            finally:
+                self._release()
+        except LLMDegraded as e:
+            self._fallbacks[e.reason] += 1
+            raise
+
+    async def call(
+        self,
+        fn: Callable[[], Awaitable[Any]],
+        priority: int = PRIORITY_INTERACTIVE,
+        queue_timeout: Optional[float] = None,
+        deadline: Optional[float] = None,
+        hedge_after: Optional[float] = None,
+    ) -> Any:
+        """
+        Run `fn()` once admitted, within a deadline.
+
+        Args:
+            fn: Coroutine factory for one attempt (called again for a hedge)
+            priority: PRIORITY_INTERACTIVE or PRIORITY_BACKGROUND
+            queue_timeout: Override the class's admission deadline
+            deadline: Override the class's whole-call deadline (seconds)
+            hedge_after: Override the class's hedge delay (0 = no hedge)
+
+        Raises:
+            LLMDegraded: Circuit open, queue timeout or deadline exceeded
+            Exception: Whatever the last failed attempt raised
+        """
+        self._requests += 1
+        try:
+            return await self._call(fn, priority, queue_timeout, deadline, hedge_after)
+        except LLMDegraded as e:
+            self._fallbacks[e.reason] += 1
+            raise
+
+    def stats(self) -> dict:
+        """Counters for /metrics."""
+        fallbacks = sum(self._fallbacks.values())
+        return {
+            "active": self._active,
+            "queued": len(self._waiters),
+            "max_concurrency": self.max_concurrency,
+            "rate_tokens": round(self.bucket.tokens, 2),
+            "by_priority": self._metrics,
+            "breaker": self.breaker.stats(),
+            "requests": self._requests,
+            "fallbacks": dict(self._fallbacks),
+            "fallback_rate": round(fallbacks / self._requests, 3) if self._requests else 0.0,
+            "hedges": self._hedges,
+        }
+
+    # -------------------------------------------------------------------------
+    # Execution
+    # -------------------------------------------------------------------------
+
+    async def _call(self, fn, priority: int, queue_timeout, deadline, hedge_after) -> Any:
+        timeout = self.deadline_for(priority) if deadline is None else deadline
+        start = time.monotonic()
+        deadline_at = start + timeout
+        hedge_delay = self.hedge_after.get(priority, 0.0) if hedge_after is None else hedge_after
+
+        if not self.breaker.allow():
+            raise LLMCircuitOpen("LLM circuit breaker is open")
+
+        queue_limit = self.queue_timeouts.get(priority, 30.0) if queue_timeout is None else queue_timeout
+        try:
+            await self._admit(priority, min(queue_limit, timeout))
+        except BaseException:
+            self.breaker.record_abandoned()
+            raise
+
+        attempts = [asyncio.ensure_future(fn())]
+        hedge_at = start + hedge_delay if hedge_delay > 0 else None
+        slots = 1
+        last_error: Optional[BaseException] = None
+        try:
+            pending = set(attempts)
+            while pending:
+                now = time.monotonic()
+                if now >= deadline_at:
+                    self.breaker.record_failure()
+                    raise LLMDeadlineExceeded(f"LLM call exceeded its {timeout:.1f}s deadline")
+
+                wait = deadline_at - now
+                if hedge_at is not None and len(attempts) == 1:
+                    wait = min(wait, max(0.0, hedge_at - now))
+                done, pending = await asyncio.wait(pending, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    if task.exception() is None:
+                        self.breaker.record_success()
+                        if len(attempts) > 1 and task is attempts[1]:
+                            self._hedges["won"] += 1
+                        return task.result()
+                    last_error = task.exception()
+                    self.breaker.record_failure()
+
+                if (
+                    pending and len(attempts) == 1 and hedge_at is not None
+                    and time.monotonic() >= hedge_at and self._try_admit_now()
+                ):
+                    # Slow primary and spare capacity: race a second attempt
+                    slots += 1
+                    self._hedges["launched"] += 1
+                    hedge = asyncio.ensure_future(fn())
+                    attempts.append(hedge)
+                    pending.add(hedge)
+
+            raise last_error
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                self.breaker.record_abandoned()
+            raise
+        finally:
+            for task in attempts:
+                if not task.done():
+                    task.cancel()
+                    task.add_done_callback(_consume_result)
+            for _ in range(slots):
+                self._release()
+
+    # -------------------------------------------------------------------------
+    # Admission
+    # -------------------------------------------------------------------------
+
+    async def _admit(self, priority: int, queue_timeout: Optional[float]):
+        name = PRIORITY_NAMES.get(priority, "background")
+        metrics = self._metrics[name]
+        start = time.monotonic()
+        timeout = self.queue_timeouts.get(priority, 30.0) if queue_timeout is None else queue_timeout
+        deadline = start + timeout
+
+        try:
+            await self._acquire_slot(priority, deadline)
+        except LLMQueueTimeout:
+            metrics["queue_timeouts"] += 1
+            raise
+
+        # Rate limit once a slot is held, so queue order is kept
+        try:
+            while (wait := self.bucket.take()) > 0:
+                if time.monotonic() + wait > deadline:
+                    metrics["queue_timeouts"] += 1
+                    raise LLMQueueTimeout(f"{name} call rate-limited past its {timeout:.1f}s queue deadline")
+                await asyncio.sleep(wait)
+        except BaseException:
+            self._release()
+            raise
+
+        metrics["admitted"] += 1
+        metrics["queue_ms_max"] = max(metrics["queue_ms_max"], round((time.monotonic() - start) * 1000, 1))
+
+    async def _acquire_slot(self, priority: int, deadline: float):
+        if self._active < self.max_concurrency and not self._waiters:
+            self._active += 1
+            return
+
+        fut = asyncio.get_running_loop().create_future()
+        entry = (priority, next(self._seq), fut)
+        heapq.heappush(self._waiters, entry)
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), max(0.0, deadline - time.monotonic()))
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if fut.done():
+                # Granted just as we gave up: hand the slot on
+                self._release()
+            else:
+                # Keep the heap free of abandoned waiters
+                fut.cancel()
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            raise LLMQueueTimeout("LLM queue deadline exceeded") from None
+
+    def _try_admit_now(self) -> bool:
+        """Take a slot and a rate token only if both are free right now."""
+        if self._active >= self.max_concurrency or self._waiters:
+            return False
+        if self.bucket.take() > 0:
+            return False
+        self._active += 1
+        return True
+
+    def _release(self):
+        """Free a slot, handing it straight to the best waiting call."""
+        if self._waiters:
+            _, _, fut = heapq.heappop(self._waiters)
+            fut.set_result(None)
+            return
+        self._active -= 1
+
+
+def _consume_result(task: asyncio.Future):
+    """Retrieve a cancelled attempt's outcome so it isn't logged as unhandled."""
+    if not task.cancelled():
+        task.exception()
+
+
+# Shared instance for every LLM caller in the process
+gateway = LLMGateway()
@@ -1,32 +1,28 @@
 """
 PathGreen-AI: LLM Handler
 
-Gemini integration for conversational fleet queries with RAG context.
+LLM integration for conversational fleet queries with RAG context.
 """
 
-import os
 from typing import Optional
 from dotenv import load_dotenv
 
 from rag import rag_handler
+from chat_cache import ResponseCache, make_key
+from fleet_context import render_fleet_context
+from llm_backends import get_backend
+from llm_gateway import PRIORITY_INTERACTIVE, LLMDegraded, gateway
 
 load_dotenv()
 
-# Check for Gemini API key
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-GEMINI_AVAILABLE = bool(GEMINI_API_KEY) and GEMINI_API_KEY != "your_gemini_api_key_here"
-
-if GEMINI_AVAILABLE:
-    try:
-        import google.generativeai as genai
-        genai.configure(api_key=GEMINI_API_KEY)
-        model = genai.GenerativeModel("gemini-2.5-flash")
-        print("[LLM] Gemini API configured successfully")
-    except Exception as e:
-        print(f"[LLM] Gemini initialization failed: {e}")
-        GEMINI_AVAILABLE = False
+# Shared with main.py: Gemini is configured once per process
+backend = get_backend()
+LLM_AVAILABLE = backend is not None
+
+if LLM_AVAILABLE:
+    print(f"[LLM] Backend ready: {backend.name} ({backend.model_name})")
 else:
-    print("[LLM] Gemini API key not configured, using mock responses")
+    print("[LLM] No LLM backend configured, using mock responses")
 
 
 SYSTEM_PROMPT = """You are PathGreen-AI, a real-time fleet emissions monitoring assistant for Indian logistics companies.
@@ -51,7 +47,8 @@ async def generate_response(
     query: str,
     vehicle_context: Optional[dict] = None,
     alert_context: Optional[dict] = None,
-) -> tuple[str, list[str]]:
+    priority: int = PRIORITY_INTERACTIVE,
+) -> tuple[str, list[str], bool]:
     """
     Generate LLM response to a fleet manager query.
     
@@ -59,13 +56,16 @@ async def generate_response(
         query: User's natural language question
         vehicle_context: Optional current vehicle state data
         alert_context: Optional recent alert data
+        priority: LLM gateway priority class (interactive or background)
     
     Returns:
-        Tuple of (response_text, citation_list)
+        Tuple of (response_text, citation_list, from_backend); from_backend
+        is False when the text is the offline mock reply
     """
-    # Get RAG context
-    rag_context = rag_handler.get_context(query)
-    citations = rag_handler.get_citations(query)
+    # Get RAG context (one retrieval for both context and citations)
+    retrieval = rag_handler.retrieve(query)
+    rag_context = retrieval.context()
+    citations = retrieval.citations()
     
     # Build prompt
     prompt_parts = [
@@ -74,28 +74,29 @@ async def generate_response(
         rag_context,
     ]
     
-    if vehicle_context:
-        prompt_parts.append("\n## Current Vehicle Data:\n")
-        prompt_parts.append(str(vehicle_context))
-    
-    if alert_context:
-        prompt_parts.append("\n## Recent Alerts:\n")
-        prompt_parts.append(str(alert_context))
+    if vehicle_context or alert_context:
+        # Token-budgeted summary instead of dumping whole state dicts
+        alerts = [alert_context] if isinstance(alert_context, dict) else alert_context
+        prompt_parts.append("\n## Current Fleet Data:\n")
+        prompt_parts.append(render_fleet_context(query, vehicle_context, alerts))
     
     prompt_parts.append(f"\n## User Question:\n{query}")
     prompt_parts.append("\n## Your Response:")
     
     full_prompt = "\n".join(prompt_parts)
     
-    if GEMINI_AVAILABLE:
+    if LLM_AVAILABLE:
         try:
-            response = await model.generate_content_async(full_prompt)
-            return response.text, citations
+            text = await gateway.call(lambda: backend.generate(full_prompt), priority=priority)
+            return text, citations, True
+        except LLMDegraded as e:
+            print(f"[LLM] Gateway degraded ({e.reason}), using mock response")
+            return generate_mock_response(query, rag_context), citations, False
         except Exception as e:
-            print(f"[LLM] Gemini error: {e}")
-            return generate_mock_response(query, rag_context), citations
+            print(f"[LLM] {backend.name} error: {e}")
+            return generate_mock_response(query, rag_context), citations, False
     else:
-        return generate_mock_response(query, rag_context), citations
+        return generate_mock_response(query, rag_context), citations, False
 
 
 def generate_mock_response(query: str, context: str = "") -> str:
@@ -193,12 +194,25 @@ def generate_mock_response(query: str, context: str = "") -> str:
     )
 
 
+def _vehicle_list(vehicles) -> list[dict]:
+    """Vehicle states as a list of dicts with an "id" (for cache keys)."""
+    if not vehicles:
+        return []
+    if isinstance(vehicles, dict):
+        return [
+            {"id": vid, **state} if isinstance(state, dict) else {"id": vid, "status": state}
+            for vid, state in vehicles.items()
+        ]
+    return list(vehicles)
+
+
 class LLMHandler:
     """Handler for LLM-based query processing."""
     
-    def __init__(self):
+    def __init__(self, cache: Optional[ResponseCache] = None):
         # Initialize RAG
         rag_handler.initialize()
+        self.cache = cache or ResponseCache()
     
     async def process_query(
         self,
@@ -217,16 +231,27 @@ class LLMHandler:
         Returns:
             Dict with response, citations, and metadata
         """
-        response_text, citations = await generate_response(
+        model_name = backend.model_name if LLM_AVAILABLE else "mock"
+        cache_key = make_key(query, _vehicle_list(vehicles))
+        cached = self.cache.get(cache_key) if LLM_AVAILABLE else None
+        if cached:
+            return {**cached, "model": model_name, "cached": True}
+
+        response_text, citations, from_backend = await generate_response(
             query,
             vehicle_context=vehicles,
             alert_context=alerts,
         )
         
+        # Only real answers are cached; a fallback reply during an outage
+        # must not outlive it (the SQLite tier would even keep it across restarts)
+        if from_backend:
+            self.cache.put(cache_key, {"response": response_text, "citations": citations})
+        
         return {
             "response": response_text,
             "citations": citations,
-            "model": "gemini-1.5-flash" if GEMINI_AVAILABLE else "mock",
+            "model": model_name if from_backend else "mock",
         }
 
 
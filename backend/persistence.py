@@ -0,0 +1,290 @@
+"""
+PathGreen-AI: Persistence Writer
+
+Write-behind queue for emission, alert and chat logs.
+
+Request handlers and the tick loop only enqueue rows (non-blocking). A worker
+thread drains the queue, groups rows per table, and bulk-inserts them into
+every configured backend when a batch fills up or the flush interval passes.
+Failed batches are retried with backoff, then spilled to disk as JSONL and
+replayed once the backend recovers.
+"""
+
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# BACKENDS
+# =============================================================================
+
+class SupabaseBackend:
+    """Bulk inserts through the (synchronous) Supabase client."""
+
+    name = "supabase"
+
+    def __init__(self, client):
+        self.client = client
+
+    def insert_many(self, table: str, rows: list[dict]):
+        self.client.table(table).insert(rows).execute()
+
+
+class SQLiteBackend:
+    """
+    Local SQLite stand-in for Supabase.
+
+    Mirrors the emission_logs, alerts and chat_history tables so the write
+    path can be exercised in tests and offline development.
+    """
+
+    name = "sqlite"
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS emission_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            vehicle_id TEXT NOT NULL,
+            latitude REAL,
+            longitude REAL,
+            co2_grams REAL,
+            status TEXT,
+            recorded_at TEXT
+        );
+        CREATE TABLE IF NOT EXISTS alerts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            vehicle_id TEXT NOT NULL,
+            alert_type TEXT,
+            severity TEXT,
+            message TEXT,
+            latitude REAL,
+            longitude REAL,
+            created_at TEXT
+        );
+        CREATE TABLE IF NOT EXISTS chat_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_query TEXT,
+            ai_response TEXT,
+            fleet_context TEXT,
+            created_at TEXT
+        );
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # Only the writer thread touches this connection after construction
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(self.SCHEMA)
+
+    def insert_many(self, table: str, rows: list[dict]):
+        columns = list(rows[0].keys())
+        sql = (
+            f"INSERT INTO {table} ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' for _ in columns)})"
+        )
+        values = [
+            tuple(
+                json.dumps(row.get(c)) if isinstance(row.get(c), (list, dict)) else row.get(c)
+                for c in columns
+            )
+            for row in rows
+        ]
+        with self.conn:
+            self.conn.executemany(sql, values)
+
+
+# =============================================================================
+# WRITER
+# =============================================================================
+
+class PersistenceWriter:
+    """
+    Bounded write-behind queue with a batching worker thread.
+
+    Args:
+        backends: Objects with `name` and `insert_many(table, rows)`
+        max_queue: Rows buffered before new rows are dropped
+        batch_size: Rows per flush
+        flush_interval: Max seconds a row waits before being flushed
+        max_retries: Attempts per batch and backend before spilling
+        retry_backoff: Base backoff in seconds (doubles per attempt)
+        spill_dir: Where failed batches are written as JSONL
+    """
+
+    def __init__(
+        self,
+        backends: list,
+        max_queue: int = 10000,
+        batch_size: int = 200,
+        flush_interval: float = 1.0,
+        max_retries: int = 3,
+        retry_backoff: float = 0.5,
+        spill_dir: str = "./output/spill",
+    ):
+        self.backends = backends
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_retries = max(1, max_retries)
+        self.retry_backoff = retry_backoff
+        self.spill_dir = Path(spill_dir)
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self._metrics = {
+            "enqueued": 0,
+            "flushed": 0,
+            "dropped": 0,
+            "batches": 0,
+            "retries": 0,
+            "failed_batches": 0,
+            "spilled_rows": 0,
+            "replayed_rows": 0,
+            "last_flush_ms": 0.0,
+        }
+
+    def start(self):
+        """Start the worker thread (no-op without backends)."""
+        if not self.backends or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="persistence-writer", daemon=True)
+        self._thread.start()
+        logger.info(f"[DB] Write-behind persistence started ({', '.join(b.name for b in self.backends)})")
+
+    def stop(self, timeout: float = 5.0):
+        """Flush what's queued and stop the worker."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def enqueue(self, table: str, row: dict) -> bool:
+        """
+        Queue a row for insertion. Never blocks.
+
+        Returns:
+            False if there are no backends or the queue is full
+        """
+        if not self.backends:
+            return False
+        try:
+            self._queue.put_nowait((table, row))
+            self._metrics["enqueued"] += 1
+            return True
+        except queue.Full:
+            self._metrics["dropped"] += 1
+            return False
+
+    def metrics(self) -> dict:
+        """Counters for /metrics."""
+        return {
+            **self._metrics,
+            "queue_depth": self._queue.qsize(),
+            "backends": [b.name for b in self.backends],
+        }
+
+    # -------------------------------------------------------------------------
+    # Worker thread
+    # -------------------------------------------------------------------------
+
+    def _run(self):
+        while not (self._stop.is_set() and self._queue.empty()):
+            batch = self._collect()
+            if batch:
+                self._flush(batch)
+
+    def _collect(self) -> list[tuple[str, dict]]:
+        """Block until a full batch is ready or the flush interval passes."""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch: list[tuple[str, dict]]):
+        start = time.perf_counter()
+        by_table: dict[str, list[dict]] = defaultdict(list)
+        for table, row in batch:
+            by_table[table].append(row)
+
+        for backend in self.backends:
+            ok = True
+            for table, rows in by_table.items():
+                if not self._write_with_retry(backend, table, rows):
+                    ok = False
+                    self._spill(backend, table, rows)
+            if ok:
+                self._replay_spill(backend)
+
+        self._metrics["batches"] += 1
+        self._metrics["flushed"] += len(batch)
+        self._metrics["last_flush_ms"] = round((time.perf_counter() - start) * 1000, 2)
+
+    def _write_with_retry(self, backend, table: str, rows: list[dict]) -> bool:
+        for attempt in range(self.max_retries):
+            try:
+                backend.insert_many(table, rows)
+                return True
+            except Exception as e:
+                logger.warning(f"[DB] {backend.name}.{table} insert failed (attempt {attempt + 1}): {e}")
+                if attempt + 1 < self.max_retries:
+                    self._metrics["retries"] += 1
+                    time.sleep(self.retry_backoff * (2 ** attempt))
+        self._metrics["failed_batches"] += 1
+        return False
+
+    # -------------------------------------------------------------------------
+    # Spill to disk
+    # -------------------------------------------------------------------------
+
+    def _spill(self, backend, table: str, rows: list[dict]):
+        try:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+            path = self.spill_dir / f"{backend.name}-{time.time_ns()}.jsonl"
+            with path.open("w", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps({"table": table, "row": row}, ensure_ascii=False) + "\n")
+            self._metrics["spilled_rows"] += len(rows)
+            logger.error(f"[DB] Spilled {len(rows)} {table} rows to {path}")
+        except Exception as e:
+            logger.error(f"[DB] Spill failed, {len(rows)} {table} rows lost: {e}")
+
+    def _replay_spill(self, backend):
+        """Re-insert the oldest spilled file for a backend that is healthy again."""
+        if not self.spill_dir.exists():
+            return
+        files = sorted(self.spill_dir.glob(f"{backend.name}-*.jsonl"))
+        if not files:
+            return
+
+        path = files[0]
+        try:
+            by_table: dict[str, list[dict]] = defaultdict(list)
+            with path.open(encoding="utf-8") as f:
+                for line in f:
+                    entry = json.loads(line)
+                    by_table[entry["table"]].append(entry["row"])
+            for table, rows in by_table.items():
+                backend.insert_many(table, rows)
+                self._metrics["replayed_rows"] += len(rows)
+            path.unlink()
+            logger.info(f"[DB] Replayed spill file {path.name}")
+        except Exception as e:
+            logger.warning(f"[DB] Spill replay of {path.name} failed: {e}")
@@ -6,9 +6,16 @@ Replaces keyword-based search with semantic vector search using Gemini embedding
 """
 
 import os
+import re
+import math
+import heapq
+import inspect
 import logging
+import threading
+import time
+from collections import Counter, OrderedDict
 from pathlib import Path
-from typing import Optional
+from typing import Iterable, Optional
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -34,6 +41,11 @@ except ImportError as e:
     logger.warning(f"Pathway LLM xpack not available: {e}")
     PATHWAY_AVAILABLE = False
 
+from vector_index import NUMPY_AVAILABLE, HashingEmbedder, VectorIndex, chunk_fingerprint
+if NUMPY_AVAILABLE:
+    import numpy as np
+from embedding_cache import CachedEmbedder, EmbeddingStore, content_hash
+
 
 # =============================================================================
 # CONFIGURATION
@@ -51,6 +63,82 @@ SEARCH_TOP_K = 3
 MIN_TOKENS = 100
 MAX_TOKENS = 400
 
+# BM25 parameters (term-frequency saturation, length normalization)
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Memoized retrievals (distinct query term lists)
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RAG_RETRIEVAL_CACHE_SIZE", "256"))
+
+# Offline semantic search: "hashed" (local n-gram embedder + persisted
+# vector index, needs numpy) or "none" (BM25 only)
+RAG_EMBEDDER = os.getenv("RAG_EMBEDDER", "hashed").lower()
+RAG_INDEX_DIR = Path(os.getenv("RAG_INDEX_DIR", "./output/rag_index"))
+MIN_SEMANTIC_SCORE = 0.15  # cosine below this is noise for hashed n-grams
+RRF_K = 60  # reciprocal rank fusion damping
+
+# Chunk embeddings keyed by (model, content hash), shared by both handlers
+# and kept across restarts ("" = disabled)
+EMBEDDING_CACHE_DB = os.getenv("EMBEDDING_CACHE_DB", "./output/embeddings.sqlite")
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024"))
+
+_embedding_store: Optional[EmbeddingStore] = None
+_embedding_store_lock = threading.Lock()
+
+
+def get_embedding_store() -> Optional[EmbeddingStore]:
+    """Process-wide embedding store, opened on first use (None if disabled)."""
+    global _embedding_store
+    if not EMBEDDING_CACHE_DB or not NUMPY_AVAILABLE:
+        return None
+    with _embedding_store_lock:
+        if _embedding_store is None:
+            try:
+                _embedding_store = EmbeddingStore(EMBEDDING_CACHE_DB)
+                logger.info(f"[RAG] Embedding cache: {EMBEDDING_CACHE_DB}")
+            except Exception as e:
+                logger.warning(f"[RAG] Embedding cache disabled: {e}")
+                return None
+    return _embedding_store
+
+
+# =============================================================================
+# RETRIEVAL RESULTS
+# =============================================================================
+
+def source_title(source: str) -> str:
+    """Citation label for a chunk source path ("bs_vi_emission_standards" -> "Bs Vi Emission Standards")."""
+    return Path(source).stem.replace("_", " ").title()
+
+
+class RetrievalResult:
+    """
+    Chunks retrieved for one query, best first.
+
+    Context and citations are both derived from the same chunks, so the
+    sources cited are exactly the ones the prompt was given.
+    """
+
+    __slots__ = ("chunks", "scores", "sources")
+
+    def __init__(self, chunks: list[dict], scores: list[float]):
+        self.chunks = chunks
+        self.scores = scores
+        # Distinct chunk sources in rank order
+        self.sources = list(dict.fromkeys(chunk["source"] for chunk in chunks))
+
+    def context(self) -> str:
+        """Prompt-ready context string."""
+        if not self.chunks:
+            return "No relevant regulatory context found."
+        return "\n\n---\n\n".join(
+            f"[Source: {Path(chunk['source']).stem}]\n{chunk['content']}" for chunk in self.chunks
+        )
+
+    def citations(self) -> list[str]:
+        """Citation labels of the retrieved chunks' documents."""
+        return [source_title(source) for source in self.sources]
+
 
 # =============================================================================
 # PATHWAY RAG COMPONENTS
@@ -71,15 +159,65 @@ def create_llm_chat():
     )
 
 
+if PATHWAY_AVAILABLE:
+    import numpy as np
+
+    class CachedPathwayEmbedder(embedders.BaseEmbedder):
+        """
+        Pathway embedder UDF that serves chunks already in the embedding
+        store and only sends the rest to the wrapped (remote) embedder.
+        
+        Args:
+            inner: Pathway embedder to call on cache misses
+            store: Persistent (model, content hash) -> vector store
+            model_name: Cache namespace for the inner embedder's vectors
+        """
+        
+        def __init__(self, inner, store: EmbeddingStore, model_name: str):
+            super().__init__(
+                executor=pw.udfs.async_executor(
+                    retry_strategy=RETRY_STRATEGY or ExponentialBackoffRetryStrategy(max_retries=6, backoff_factor=2.5),
+                ),
+            )
+            self.inner = inner
+            self.store = store
+            self.model_name = model_name
+        
+        async def __wrapped__(self, input, **kwargs):
+            # Accept both single-text and batched embedder signatures
+            single = isinstance(input, str)
+            texts = [input] if single else list(input)
+            hashes = [content_hash(text) for text in texts]
+            cached = self.store.get_many(self.model_name, hashes)
+            
+            missing = {sha: text for sha, text in zip(hashes, texts) if sha not in cached}
+            if missing:
+                pending = list(missing.values())
+                result = self.inner.__wrapped__(pending[0] if single else pending, **kwargs)
+                if inspect.isawaitable(result):
+                    result = await result
+                vectors = [result] if single else list(result)
+                fresh = {sha: np.asarray(vector, dtype=np.float32) for sha, vector in zip(missing, vectors)}
+                self.store.put_many(self.model_name, fresh.items())
+                cached.update(fresh)
+            
+            out = [cached[sha] for sha in hashes]
+            return out[0] if single else out
+
+
 def create_embedder():
-    """Create Gemini embedder for vector search."""
+    """Create Gemini embedder for vector search (behind the embedding cache if enabled)."""
     if not PATHWAY_AVAILABLE:
         return None
     
-    return embedders.GeminiEmbedder(
+    embedder = embedders.GeminiEmbedder(
         model=EMBEDDER_MODEL,
         retry_strategy=RETRY_STRATEGY or ExponentialBackoffRetryStrategy(max_retries=6, backoff_factor=2.5),
     )
+    store = get_embedding_store()
+    if store is None:
+        return embedder
+    return CachedPathwayEmbedder(embedder, store, model_name=EMBEDDER_MODEL)
 
 
 def create_document_parser():
@@ -148,9 +286,11 @@ class PathwayRAGHandler:
                 logger.error(f"Data directory not found: {DATA_DIR}")
                 return False
             
+            # Streaming mode re-reads added, edited and deleted files
             docs = pw.io.fs.read(
                 path=str(DATA_DIR),
                 format="binary",
+                mode="streaming",
                 with_metadata=True,
             )
             
@@ -202,34 +342,42 @@ class PathwayRAGHandler:
         self._server_running = True
         self.rag_app.run_server()
     
-    def get_context(self, query: str, max_chunks: int = 3) -> str:
+    def _fallback_handler(self) -> "FallbackRAGHandler":
+        if not hasattr(self, '_fallback'):
+            self._fallback = FallbackRAGHandler()
+            self._fallback.initialize()
+        return self._fallback
+    
+    def retrieve(self, query: str, max_chunks: int = 3) -> RetrievalResult:
         """
-        Get context for a query using fallback handler.
+        Retrieve chunks for a query using fallback handler.
         
         For now, we delegate to FallbackRAGHandler for reliable context retrieval.
         Pathway VectorStore can be used for advanced semantic queries later.
-        
-        Args:
-            query: User question
-            max_chunks: Maximum chunks to return
-        
-        Returns:
-            Formatted context string
         """
-        # Use fallback handler for context (reliable keyword search)
-        if not hasattr(self, '_fallback'):
-            self._fallback = FallbackRAGHandler()
-            self._fallback.initialize()
-        
-        return self._fallback.get_context(query, max_chunks)
+        return self._fallback_handler().retrieve(query, max_chunks)
+    
+    def get_context(self, query: str, max_chunks: int = 3) -> str:
+        """Formatted context for a query (see `retrieve`)."""
+        return self._fallback_handler().get_context(query, max_chunks)
     
-    def get_citations(self, query: str) -> list[str]:
+    def get_citations(self, query: str, max_chunks: int = 3) -> list[str]:
         """Get citation sources for a query."""
+        return self._fallback_handler().get_citations(query, max_chunks)
+    
+    def stats(self) -> dict:
+        """Retrieval counters for /metrics."""
+        return self._fallback_handler().stats()
+    
+    def apply_changes(self, updated: dict[str, str], removed: Iterable[str] = ()) -> dict:
+        """
+        Re-index edited regulation files in the fallback index used for
+        retrieval (the Pathway vector store picks them up from its own
+        streaming file source).
+        """
         if not hasattr(self, '_fallback'):
-            self._fallback = FallbackRAGHandler()
-            self._fallback.initialize()
-        
-        return self._fallback.get_citations(query)
+            return {}
+        return self._fallback.apply_changes(updated, removed)
     
     def query(self, question: str) -> dict:
         """
@@ -254,20 +402,170 @@ class PathwayRAGHandler:
         }
 
 
+# =============================================================================
+# KEYWORD INDEX (BM25)
+# =============================================================================
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_SUBSCRIPT_DIGITS = str.maketrans("₀₁₂₃₄₅₆₇₈₉", "0123456789")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from has have how i in is it "
+    "its me my of on or our should so than that the their then there these "
+    "this to was we what when where which who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Index terms for BM25: lowercased alphanumeric runs, stopwords dropped,
+    plural "s" stripped ("CO₂" -> "co2", "limits" -> "limit").
+    """
+    terms = []
+    for token in _TOKEN_RE.findall(text.lower().translate(_SUBSCRIPT_DIGITS)):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith(("ss", "us", "is")):
+            token = token[:-1]
+        terms.append(token)
+    return terms
+
+
+class BM25Index:
+    """
+    Inverted index over chunks with precomputed BM25 weights.
+
+    Built once; a query only walks the postings of its own terms, so cost
+    grows with the number of matching chunks rather than the corpus size.
+
+    Args:
+        texts: Chunk texts, indexed by position
+        k1: Term-frequency saturation
+        b: Length normalization
+        term_counts: Already tokenized chunks (Counter per chunk) instead of texts
+    """
+
+    def __init__(
+        self,
+        texts: Iterable[str] = (),
+        k1: float = BM25_K1,
+        b: float = BM25_B,
+        term_counts: Optional[list[Counter]] = None,
+    ):
+        if term_counts is None:
+            term_counts = [Counter(tokenize(text)) for text in texts]
+        lengths = [sum(counts.values()) for counts in term_counts]
+        self.size = len(term_counts)
+        avg_length = (sum(lengths) / self.size) if self.size else 0.0
+
+        # term -> [(chunk index, term frequency)]
+        postings: dict[str, list[tuple[int, int]]] = {}
+        for i, counts in enumerate(term_counts):
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((i, tf))
+
+        # Fold idf and length normalization into each posting once, so a
+        # query is just a sum of precomputed weights
+        norms = [k1 * (1 - b + b * length / avg_length) if avg_length else k1 for length in lengths]
+        self.postings: dict[str, list[tuple[int, float]]] = {}
+        for term, entries in postings.items():
+            df = len(entries)
+            idf = math.log(1 + (self.size - df + 0.5) / (df + 0.5))
+            self.postings[term] = [(i, idf * tf * (k1 + 1) / (tf + norms[i])) for i, tf in entries]
+
+    def search(self, query: str, top_k: int = SEARCH_TOP_K) -> list[tuple[int, float]]:
+        """
+        Best-scoring chunks for a query.
+
+        Returns:
+            [(chunk index, score)], highest score first; only chunks sharing
+            at least one term with the query
+        """
+        scores: dict[int, float] = {}
+        for term in set(tokenize(query)):
+            for i, weight in self.postings.get(term, ()):
+                scores[i] = scores.get(i, 0.0) + weight
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+
+
+def reciprocal_rank_fusion(rankings: list[list[tuple[int, float]]], top_k: int) -> list[tuple[int, float]]:
+    """
+    Merge ranked (item, score) lists by reciprocal rank, so BM25 and cosine
+    scores never need to be put on the same scale.
+    """
+    fused: dict[int, float] = {}
+    for ranking in rankings:
+        for rank, (item, _) in enumerate(ranking):
+            fused[item] = fused.get(item, 0.0) + 1.0 / (RRF_K + rank + 1)
+    return heapq.nlargest(top_k, fused.items(), key=lambda item: item[1])
+
+
 # =============================================================================
 # FALLBACK: Simple Keyword Search (when Pathway unavailable)
 # =============================================================================
 
+class _IndexSnapshot:
+    """
+    Everything one retrieval reads, built together and never mutated.
+
+    Re-indexing builds a new snapshot and swaps the handler's reference in
+    one assignment; readers take the reference once per query, so they
+    never block and never see chunks and indexes from different versions.
+    """
+
+    __slots__ = ("documents", "chunks", "index", "vectors", "retrievals")
+
+    def __init__(self, documents: list, chunks: list, index: Optional[BM25Index], vectors: Optional[VectorIndex]):
+        self.documents = documents
+        self.chunks = chunks
+        self.index = index
+        self.vectors = vectors
+        # (query terms, max_chunks) -> RetrievalResult, least recently used
+        # first; dropped with the snapshot, so re-indexing invalidates it
+        self.retrievals: OrderedDict[tuple, RetrievalResult] = OrderedDict()
+
+
 class FallbackRAGHandler:
     """
-    Fallback RAG using simple keyword search.
+    Fallback RAG using BM25 keyword search, fused with local vector search
+    when the offline embedder is enabled (RAG_EMBEDDER).
     Used when Pathway is not available or not configured.
+    
+    `apply_changes()` re-chunks only the edited documents and swaps in a new
+    index snapshot while queries keep being served from the old one.
     """
     
     def __init__(self):
-        self.documents = []
-        self.chunks = []
+        self.embedder: Optional[CachedEmbedder] = None
+        self._snapshot = _IndexSnapshot([], [], None, None)
+        # source path -> {"doc", "sha", "chunks", "terms", "vectors"}; only
+        # touched by the writer holding _reindex_lock
+        self._records: dict[str, dict] = {}
+        self._reindex_lock = threading.Lock()
+        self._saved_fingerprint = ""
         self._initialized = False
+        self._retrievals_lock = threading.Lock()
+        self.retrieval_hits = 0
+        self.retrieval_misses = 0
+        self.reindexes = 0
+        self.last_reindex: dict = {}
+    
+    # Current snapshot's contents (retrieval reads the snapshot directly)
+    @property
+    def documents(self) -> list:
+        return self._snapshot.documents
+    
+    @property
+    def chunks(self) -> list:
+        return self._snapshot.chunks
+    
+    @property
+    def index(self) -> Optional[BM25Index]:
+        return self._snapshot.index
+    
+    @property
+    def vectors(self) -> Optional[VectorIndex]:
+        return self._snapshot.vectors
     
     def initialize(self) -> bool:
         """Load and index regulation documents."""
@@ -279,21 +577,22 @@ class FallbackRAGHandler:
                 logger.warning(f"Data directory not found: {DATA_DIR}")
                 return False
             
-            for file_path in DATA_DIR.glob("*.md"):
-                try:
-                    content = file_path.read_text(encoding="utf-8")
-                    doc = {
-                        "id": file_path.stem,
-                        "content": content,
-                        "source": str(file_path),
-                    }
-                    self.documents.append(doc)
-                    # Simple chunking by sections
-                    self.chunks.extend(self._chunk_document(doc))
-                except Exception as e:
-                    logger.error(f"Error loading {file_path}: {e}")
-            
-            logger.info(f"[RAG-Fallback] Loaded {len(self.documents)} docs, {len(self.chunks)} chunks")
+            self._init_embedder()
+            with self._reindex_lock:
+                for file_path in sorted(DATA_DIR.glob("*.md")):
+                    try:
+                        source = str(file_path)
+                        self._records[source] = self._index_document(source, file_path.read_text(encoding="utf-8"))
+                    except Exception as e:
+                        logger.error(f"Error loading {file_path}: {e}")
+                
+                snapshot = self._build_snapshot(self._records, previous=None)
+                self._snapshot = snapshot
+                self._persist(snapshot)
+            logger.info(
+                f"[RAG-Fallback] Loaded {len(snapshot.documents)} docs, {len(snapshot.chunks)} chunks, "
+                f"{len(snapshot.index.postings)} index terms"
+            )
             self._initialized = True
             return True
             
@@ -301,6 +600,142 @@ class FallbackRAGHandler:
             logger.error(f"[RAG-Fallback] Init failed: {e}")
             return False
     
+    def apply_changes(self, updated: dict[str, str], removed: Iterable[str] = ()) -> dict:
+        """
+        Re-index edited, added and deleted regulation files.
+        
+        Only the affected documents are re-chunked and re-tokenized; chunk
+        embeddings come from the embedding cache unless their text changed.
+        BM25 weights and the vector index are rebuilt from the kept
+        per-document data and swapped in atomically.
+        
+        Args:
+            updated: File path -> new markdown text (added or modified)
+            removed: Paths of deleted files
+        
+        Returns:
+            {"added", "changed", "removed"} file names (empty if nothing
+            actually changed, e.g. a file was saved without edits)
+        """
+        if not self._initialized:
+            # Not loaded yet: the first query reads the current files anyway
+            return {}
+        
+        started = time.perf_counter()
+        with self._reindex_lock:
+            records = dict(self._records)
+            added, changed, dropped = [], [], []
+            for source in removed:
+                if records.pop(source, None) is not None:
+                    dropped.append(Path(source).name)
+            for source, content in updated.items():
+                previous = records.get(source)
+                if previous is not None and previous["sha"] == content_hash(content):
+                    continue
+                records[source] = self._index_document(source, content)
+                (changed if previous is not None else added).append(Path(source).name)
+            if not (added or changed or dropped):
+                return {}
+            
+            snapshot = self._build_snapshot(records, previous=self._snapshot)
+            self._records, self._snapshot = records, snapshot
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self._persist(snapshot)
+        
+        self.reindexes += 1
+        self.last_reindex = {
+            "added": added,
+            "changed": changed,
+            "removed": dropped,
+            "chunks": len(snapshot.chunks),
+            "ms": round(elapsed_ms, 1),
+        }
+        logger.info(f"[RAG-Fallback] Re-indexed: {self.last_reindex}")
+        return {"added": added, "changed": changed, "removed": dropped}
+    
+    def _init_embedder(self):
+        """Set up the offline embedder for vector search, if enabled."""
+        if RAG_EMBEDDER == "none":
+            return
+        if RAG_EMBEDDER != "hashed":
+            logger.warning(f"[RAG-Fallback] Unknown RAG_EMBEDDER '{RAG_EMBEDDER}', using BM25 only")
+            return
+        if not NUMPY_AVAILABLE:
+            logger.warning("[RAG-Fallback] numpy not installed, using BM25 only")
+            return
+        self.embedder = CachedEmbedder(
+            HashingEmbedder(tokenize=tokenize),
+            get_embedding_store(),
+            query_cache_size=QUERY_EMBEDDING_CACHE_SIZE,
+        )
+    
+    def _index_document(self, source: str, content: str) -> dict:
+        """Chunk and tokenize one document (vectors are filled in lazily)."""
+        doc = {
+            "id": Path(source).stem,
+            "content": content,
+            "source": source,
+        }
+        # Simple chunking by sections
+        chunks = self._chunk_document(doc)
+        return {
+            "doc": doc,
+            "sha": content_hash(content),
+            "chunks": chunks,
+            "terms": [Counter(tokenize(chunk["content"])) for chunk in chunks],
+            "vectors": None,
+        }
+    
+    def _build_snapshot(self, records: dict[str, dict], previous: Optional[_IndexSnapshot]) -> _IndexSnapshot:
+        """Assemble indexes over all documents from their per-document data."""
+        ordered = [records[source] for source in sorted(records)]
+        chunks = [chunk for record in ordered for chunk in record["chunks"]]
+        index = BM25Index(term_counts=[terms for record in ordered for terms in record["terms"]])
+        vectors = self._build_vectors(ordered, chunks, previous) if self.embedder else None
+        return _IndexSnapshot([record["doc"] for record in ordered], chunks, index, vectors)
+    
+    def _build_vectors(self, ordered: list[dict], chunks: list[dict], previous: Optional[_IndexSnapshot]) -> Optional[VectorIndex]:
+        """
+        Vector index for the chunks: loaded from disk at startup while the
+        chunk fingerprint matches, otherwise rebuilt (warm-started from the
+        previous index's clusters when re-indexing).
+        """
+        if not chunks:
+            return None
+        try:
+            fingerprint = chunk_fingerprint((chunk["id"], chunk["content"]) for chunk in chunks)
+            if previous is None:
+                index = VectorIndex.load(RAG_INDEX_DIR, self.embedder.model_name, fingerprint)
+                if index is not None:
+                    logger.info(f"[RAG-Fallback] Loaded vector index ({index.size} vectors) from {RAG_INDEX_DIR}")
+                    self._saved_fingerprint = fingerprint
+                    return index
+            
+            for record in ordered:
+                if record["vectors"] is None:
+                    record["vectors"] = self.embedder.embed([chunk["content"] for chunk in record["chunks"]])
+            vectors = np.concatenate([record["vectors"] for record in ordered])
+            if previous is not None and previous.vectors is not None:
+                index = previous.vectors.rebuild(vectors, fingerprint)
+            else:
+                index = VectorIndex.build(vectors, self.embedder.model_name, fingerprint)
+            logger.info(f"[RAG-Fallback] Built vector index ({index.size} vectors, {index.n_lists} lists)")
+            return index
+        except Exception as e:
+            logger.error(f"[RAG-Fallback] Vector index unavailable, using BM25 only: {e}")
+            return None
+    
+    def _persist(self, snapshot: _IndexSnapshot):
+        """Save a newly built vector index so restarts can memory-map it."""
+        index = snapshot.vectors
+        if index is None or index.fingerprint == self._saved_fingerprint:
+            return
+        try:
+            index.save(RAG_INDEX_DIR)
+            self._saved_fingerprint = index.fingerprint
+        except OSError as e:
+            logger.warning(f"[RAG-Fallback] Could not persist vector index: {e}")
+    
     def _chunk_document(self, doc: dict, chunk_size: int = 500) -> list[dict]:
         """Split document into chunks."""
         content = doc["content"]
@@ -341,65 +776,95 @@ class FallbackRAGHandler:
         
         return chunks
     
-    def get_context(self, query: str, max_chunks: int = 3) -> str:
+    def retrieve(self, query: str, max_chunks: int = 3) -> RetrievalResult:
         """
-        Retrieve relevant context using keyword matching.
+        Ranked chunks for a query, memoized per distinct term list.
         
         Args:
             query: User question
             max_chunks: Maximum chunks to return
         
         Returns:
-            Formatted context string
+            RetrievalResult (chunks, scores, sources)
         """
         if not self._initialized:
             self.initialize()
         
-        if not self.chunks:
-            return "No regulatory context available."
-        
-        query_lower = query.lower()
-        query_terms = set(query_lower.split())
+        snapshot = self._snapshot
+        # Queries that tokenize to the same terms rank identically
+        key = (tuple(tokenize(query)), max_chunks)
+        with self._retrievals_lock:
+            result = snapshot.retrievals.get(key)
+            if result is not None:
+                snapshot.retrievals.move_to_end(key)
+                self.retrieval_hits += 1
+                return result
         
-        scored = []
-        for chunk in self.chunks:
-            content_lower = chunk["content"].lower()
-            score = sum(content_lower.count(term) for term in query_terms)
-            
-            # Boost key terms
-            for term in ["idle", "emission", "bs-vi", "violation", "limit", "zone"]:
-                if term in query_lower and term in content_lower:
-                    score += 5
-            
-            if score > 0:
-                scored.append((score, chunk))
+        ranked = self._rank(snapshot, query, max_chunks)
+        result = RetrievalResult([snapshot.chunks[i] for i, _ in ranked], [score for _, score in ranked])
         
-        scored.sort(key=lambda x: x[0], reverse=True)
-        top_chunks = [c for _, c in scored[:max_chunks]]
+        with self._retrievals_lock:
+            self.retrieval_misses += 1
+            snapshot.retrievals[key] = result
+            while len(snapshot.retrievals) > RETRIEVAL_CACHE_SIZE:
+                snapshot.retrievals.popitem(last=False)
+        return result
+    
+    def _rank(self, snapshot: _IndexSnapshot, query: str, max_chunks: int) -> list[tuple[int, float]]:
+        """BM25 ranking, fused with vector search when the index is loaded."""
+        if snapshot.vectors is None:
+            return snapshot.index.search(query, max_chunks) if snapshot.index else []
         
-        if not top_chunks:
-            return "No relevant regulatory context found."
+        depth = max(3 * max_chunks, 10)
+        keyword = snapshot.index.search(query, depth) if snapshot.index else []
+        semantic = [
+            (i, score) for i, score in snapshot.vectors.search(self.embedder.embed_query(query), depth)[0]
+            if score >= MIN_SEMANTIC_SCORE
+        ]
+        return reciprocal_rank_fusion([keyword, semantic], max_chunks)
+    
+    def get_context(self, query: str, max_chunks: int = 3) -> str:
+        """
+        Retrieve relevant context using BM25 (+ vector) ranking.
         
-        context_parts = []
-        for chunk in top_chunks:
-            source = Path(chunk["source"]).stem
-            context_parts.append(f"[Source: {source}]\n{chunk['content']}")
+        Args:
+            query: User question
+            max_chunks: Maximum chunks to return
         
-        return "\n\n---\n\n".join(context_parts)
-    
-    def get_citations(self, query: str) -> list[str]:
-        """Get citation sources for a query."""
+        Returns:
+            Formatted context string
+        """
         if not self._initialized:
             self.initialize()
         
-        context = self.get_context(query)
-        citations = set()
-        
-        for chunk in self.chunks[:3]:
-            source = Path(chunk["source"]).stem
-            citations.add(source.replace("_", " ").title())
+        if not self.chunks:
+            return "No regulatory context available."
         
-        return list(citations)
+        return self.retrieve(query, max_chunks).context()
+    
+    def get_citations(self, query: str, max_chunks: int = 3) -> list[str]:
+        """Get citation sources of the chunks retrieved for a query."""
+        return self.retrieve(query, max_chunks).citations()
+    
+    def stats(self) -> dict:
+        """Index size and retrieval cache counters for /metrics."""
+        snapshot = self._snapshot
+        lookups = self.retrieval_hits + self.retrieval_misses
+        return {
+            "documents": len(snapshot.documents),
+            "chunks": len(snapshot.chunks),
+            "terms": len(snapshot.index.postings) if snapshot.index else 0,
+            "vectors": snapshot.vectors.size if snapshot.vectors else 0,
+            "embeddings": self.embedder.stats() if self.embedder else None,
+            "reindexes": self.reindexes,
+            "last_reindex": self.last_reindex,
+            "retrieval_cache": {
+                "entries": len(snapshot.retrievals),
+                "hits": self.retrieval_hits,
+                "misses": self.retrieval_misses,
+                "hit_rate": round(self.retrieval_hits / lookups, 3) if lookups else 0.0,
+            },
+        }
 
 
 # =============================================================================
@@ -0,0 +1,412 @@
+"""
+PathGreen-AI: Regulation Lookup
+
+Deterministic fast path for chat questions that are plain lookups in the
+regulation documents (idle limits per zone, CO₂ limits per vehicle class,
+penalties, the load adjustment formula).
+
+The markdown files in data/regulations are parsed at startup (and per file
+again when they are edited, see with_changes) into tables, bold
+"key: value" bullets and code blocks, tagged with their document and
+section. An intent matcher answers matching questions straight
+from that data with citations; anything open-ended or about specific
+vehicles falls through to the LLM.
+"""
+
+import logging
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).parent / "data" / "regulations"
+
+
+# =============================================================================
+# MARKDOWN PARSING
+# =============================================================================
+
+_SECTION_RE = re.compile(r"Section\s+([\d.]+)")
+_BOLD_FACT_RE = re.compile(r"^[-*]\s+\*\*(.+?)\*\*\s*:?\s*(.+)$")
+_PLAIN_FACT_RE = re.compile(r"^[-*]\s+([^:*]{2,40}):\s+(.+)$")
+
+
+def _source_title(stem: str) -> str:
+    """Citation label for a document, matching the RAG handlers."""
+    return stem.replace("_", " ").title()
+
+
+def _split_row(line: str) -> list[str]:
+    return [cell.strip() for cell in line.strip().strip("|").split("|")]
+
+
+def parse_regulation_markdown(source: str, text: str) -> dict:
+    """
+    Extract structured content from one regulation document.
+
+    Args:
+        source: Document stem (e.g. "bs_vi_emission_standards")
+        text: Markdown content
+
+    Returns:
+        {"tables": [...], "facts": [...], "code": [...]}, each entry tagged
+        with "source", "section" and "heading"
+    """
+    tables, facts, code = [], [], []
+    section, heading = "", ""
+    lines = text.splitlines()
+    i = 0
+
+    def tag() -> dict:
+        return {"source": source, "section": section, "heading": heading}
+
+    while i < len(lines):
+        line = lines[i].rstrip()
+
+        if line.startswith("## "):
+            title = line[3:].strip()
+            match = _SECTION_RE.search(title)
+            section = f"Section {match.group(1)}" if match else title
+            heading = title
+        elif line.startswith("### "):
+            heading = line[4:].strip()
+        elif line.startswith("```"):
+            block = []
+            i += 1
+            while i < len(lines) and not lines[i].startswith("```"):
+                block.append(lines[i])
+                i += 1
+            code.append({**tag(), "text": "\n".join(block).strip()})
+        elif line.startswith("|") and i + 1 < len(lines) and set(lines[i + 1].strip()) <= set("|-: "):
+            columns = _split_row(line)
+            rows = []
+            i += 2
+            while i < len(lines) and lines[i].startswith("|"):
+                cells = _split_row(lines[i])
+                rows.append(dict(zip(columns, cells)))
+                i += 1
+            tables.append({**tag(), "columns": columns, "rows": rows})
+            continue
+        else:
+            match = _BOLD_FACT_RE.match(line) or _PLAIN_FACT_RE.match(line)
+            if match:
+                facts.append({**tag(), "key": match.group(1).strip(), "value": match.group(2).strip()})
+        i += 1
+
+    return {"tables": tables, "facts": facts, "code": code}
+
+
+def _number(text: str) -> Optional[float]:
+    match = re.search(r"\d[\d,]*(?:\.\d+)?", text)
+    return float(match.group(0).replace(",", "")) if match else None
+
+
+# =============================================================================
+# LOOKUP DATA
+# =============================================================================
+
+class RegulationAnswer:
+    """A direct answer with the documents it came from."""
+
+    __slots__ = ("intent", "text", "citations")
+
+    def __init__(self, intent: str, text: str, citations: list[str]):
+        self.intent = intent
+        self.text = text
+        self.citations = citations
+
+
+class RegulationIndex:
+    """
+    Structured regulation data plus the intent matcher over it.
+
+    Build with `RegulationIndex.load()`; `answer()` returns None for
+    questions it can't answer exactly.
+    """
+
+    def __init__(self, documents: dict[str, dict]):
+        self.documents = documents
+        # zone label -> (seconds, citation)
+        self.idle_limits: dict[str, tuple[int, str]] = {}
+        # class label -> {"unloaded": g/km, "loaded": g/km, "citation": ...}
+        self.co2_limits: dict[str, dict] = {}
+        # violation -> {"first": ..., "repeat": ..., "citation": ...}
+        self.penalties: dict[str, dict] = {}
+        # Escalation for idle offenses under BS-VI (ordered)
+        self.idle_offenses: list[tuple[str, str]] = []
+        self.idle_offense_citation = ""
+        self.load_formula: Optional[dict] = None
+        self.answered: Counter = Counter()
+        self.fallthrough = 0
+        self._build()
+        labels = [*self.idle_limits, *self.co2_limits, *self.penalties]
+        self._vocabulary = self._LOOKUP_WORDS | {w for label in labels for w in self._WORD_RE.findall(label.lower())}
+
+    @classmethod
+    def load(cls, data_dir: Path = DATA_DIR) -> "RegulationIndex":
+        """Parse every regulation markdown file in `data_dir`."""
+        documents = {}
+        if data_dir.exists():
+            for path in sorted(data_dir.glob("*.md")):
+                try:
+                    documents[path.stem] = parse_regulation_markdown(path.stem, path.read_text(encoding="utf-8"))
+                except Exception as e:
+                    logger.error(f"[Regulations] Failed to parse {path.name}: {e}")
+        index = cls(documents)
+        logger.info(
+            f"[Regulations] Parsed {len(documents)} docs: {len(index.idle_limits)} idle limits, "
+            f"{len(index.co2_limits)} CO₂ classes, {len(index.penalties)} penalties"
+        )
+        return index
+
+    def with_changes(self, updated: dict[str, str], removed: Iterable[str] = ()) -> "RegulationIndex":
+        """
+        New index with edited files re-parsed and removed ones dropped;
+        unchanged documents are reused as parsed.
+
+        Args:
+            updated: File path -> new markdown text
+            removed: Paths of deleted files
+        """
+        removed = list(removed)
+        documents = dict(self.documents)
+        for path in removed:
+            documents.pop(Path(path).stem, None)
+        for path, text in updated.items():
+            stem = Path(path).stem
+            try:
+                documents[stem] = parse_regulation_markdown(stem, text)
+            except Exception as e:
+                logger.error(f"[Regulations] Failed to parse {Path(path).name}, keeping previous version: {e}")
+        index = type(self)(dict(sorted(documents.items())))
+        # Lookup counters describe the endpoint, not one version of the data
+        index.answered, index.fallthrough = self.answered, self.fallthrough
+        logger.info(
+            f"[Regulations] Re-parsed {len(updated)} docs, dropped {len(removed)}: "
+            f"{len(index.idle_limits)} idle limits, {len(index.co2_limits)} CO₂ classes"
+        )
+        return index
+
+    def _citation(self, entry: dict) -> str:
+        title = _source_title(entry["source"])
+        return f"{title} ({entry['section']})" if entry["section"].startswith("Section") else title
+
+    def _build(self):
+        for doc in self.documents.values():
+            for fact in doc["facts"]:
+                heading = fact["heading"].lower()
+                seconds = _number(fact["value"])
+                if "idle duration" in heading and seconds is not None:
+                    self.idle_limits[fact["key"]] = (int(seconds), self._citation(fact))
+                elif heading == "violations" and "offense" in fact["key"].lower():
+                    self.idle_offenses.append((fact["key"], fact["value"]))
+                    self.idle_offense_citation = self._citation(fact)
+
+            for table in doc["tables"]:
+                columns = [c.lower() for c in table["columns"]]
+                if columns and columns[0] == "vehicle class":
+                    for row in table["rows"]:
+                        values = list(row.values())
+                        self.co2_limits[values[0]] = {
+                            "unloaded": _number(values[1]),
+                            "loaded": _number(values[2]),
+                            "citation": self._citation(table),
+                        }
+                elif columns and columns[0] == "violation":
+                    for row in table["rows"]:
+                        values = list(row.values())
+                        self.penalties[values[0]] = {
+                            "first": values[1],
+                            "repeat": values[2],
+                            "citation": self._citation(table),
+                        }
+                elif columns and columns[0] == "parameter":
+                    for row in table["rows"]:
+                        values = list(row.values())
+                        if values[0].lower() == "max idle":
+                            for zone, value in zip(table["columns"][1:], values[1:]):
+                                seconds = _number(value)
+                                if seconds is not None:
+                                    self.idle_limits.setdefault(zone, (int(seconds), self._citation(table)))
+
+            for block in doc["code"]:
+                match = re.search(r"\(Load_kg\s*/\s*(\d+)\)\s*[×x*]\s*(\d+(?:\.\d+)?)", block["text"])
+                if match:
+                    self.load_formula = {
+                        "text": block["text"],
+                        "per_kg": float(match.group(1)),
+                        "g_per_km": float(match.group(2)),
+                        "citation": self._citation(block),
+                    }
+
+    # -------------------------------------------------------------------------
+    # Intent matching
+    # -------------------------------------------------------------------------
+
+    # Questions about live vehicles or asking for reasoning go to the LLM
+    _FALLTHROUGH_RE = re.compile(
+        r"\btrk[-\s]?\d+\b|\bwhy\b|\bwhich\b|\bmy\b|\bour\b|\bfleet\b|\bcurrently\b"
+        r"|\bexplain\w*|\breasons?\b|\brelat(e|es|ed|ion|ionship)\b"
+    )
+    _IDLE_RE = re.compile(r"\bidl(e|ing)\b")
+    _LIMIT_RE = re.compile(r"\b(limits?|max(imum)?|allowed|how long|duration|permitted|threshold)\b")
+    _CO2_RE = re.compile(r"\b(co2|co₂|emissions?)\b")
+    _PENALTY_RE = re.compile(r"\b(penalt(y|ies)|fines?|offen[cs]es?|punish\w*)\b")
+    _FORMULA_RE = re.compile(r"\b(load adjust\w*|adjusted limit|adjustment formula)\b")
+    _LOAD_RE = re.compile(r"(\d[\d,]*(?:\.\d+)?)\s*(kg|kilograms?|t|tonnes?|tons?)\b")
+
+    # Words in violation names too generic to pick one out
+    _GENERIC_WORDS = {"no", "excess", "violation"}
+
+    # Words a plain table lookup is phrased with. A question using any other
+    # word (besides the table labels themselves) asks about something the
+    # tables don't cover - electric vehicles, PUC certificates, a city - and
+    # goes to the LLM rather than getting a table that doesn't answer it.
+    _WORD_RE = re.compile(r"[a-z][a-z0-9₂]*")
+    _LOOKUP_WORDS = frozenset("""
+        a an the of for in on at to by with per each and or is are be it its
+        what whats s how long much can do does i we my our me tell show list give please
+        there any all under over during above below when if get
+        truck trucks vehicle vehicles commercial fleet zone zones class classes category categories
+        limit limits max maximum allowed permitted permissible duration threshold thresholds
+        continuous idle idling idle time times second seconds sec secs minute minutes
+        co2 co₂ co carbon emission emissions g gram grams km
+        penalty penalties fine fines offense offenses offence offences punishment punishments
+        first repeat repeated second third violation violations
+        bs vi bsvi standard standards regulation regulations rule rules norm norms
+        load loads loaded unloaded carrying carries carry weight payload
+        adjust adjusted adjustment formula calculate calculated calculation compute
+        tonne tonnes ton tons t kg kilogram kilograms
+        lcv mcv hcv light medium heavy
+    """.split())
+
+    _CLASS_ALIASES = {
+        "lcv": ("lcv", "light"),
+        "mcv": ("mcv", "medium"),
+        "hcv": ("hcv", "heavy"),
+    }
+
+    def answer(self, query: str) -> Optional[RegulationAnswer]:
+        """
+        Answer a pure regulation lookup, or None to fall through to the LLM.
+
+        Args:
+            query: User question (already screened by the injection guard)
+        """
+        answer = self._match(query.lower())
+        if answer:
+            self.answered[answer.intent] += 1
+        else:
+            self.fallthrough += 1
+        return answer
+
+    def stats(self) -> dict:
+        """Counters for /metrics."""
+        return {"answered": dict(self.answered), "fallthrough": self.fallthrough}
+
+    def _match(self, q: str) -> Optional[RegulationAnswer]:
+        # Generic table questions get the whole table; questions about
+        # anything outside the tables' vocabulary reach the LLM
+        if self._FALLTHROUGH_RE.search(q):
+            return None
+        if any(word not in self._vocabulary for word in self._WORD_RE.findall(q)):
+            return None
+
+        if self.load_formula and (self._FORMULA_RE.search(q) or ("load" in q and self._LOAD_RE.search(q))):
+            return self._answer_formula(q)
+        if self.penalties and self._PENALTY_RE.search(q):
+            return self._answer_penalty(q)
+        if self.idle_limits and self._IDLE_RE.search(q) and self._LIMIT_RE.search(q):
+            return self._answer_idle(q)
+        if self.co2_limits and self._CO2_RE.search(q) and (self._LIMIT_RE.search(q) or self._match_classes(q)):
+            return self._answer_co2(q)
+        return None
+
+    def _match_classes(self, q: str) -> list[str]:
+        matched = []
+        for label in self.co2_limits:
+            aliases = self._CLASS_ALIASES.get(label.split()[0].lower(), (label.split()[0].lower(),))
+            if any(re.search(rf"\b{alias}\b", q) for alias in aliases):
+                matched.append(label)
+        return matched
+
+    def _answer_idle(self, q: str) -> Optional[RegulationAnswer]:
+        zones = [
+            zone for zone in self.idle_limits
+            if re.search(rf"\b{re.escape(zone.lower().split()[0].split('/')[0])}\b", q)
+        ]
+        zones = zones or list(self.idle_limits)
+        lines = ["**Maximum continuous idle duration:**\n", "| Zone | Max Idle |", "|------|----------|"]
+        lines += [f"| {zone} | {self.idle_limits[zone][0]} seconds |" for zone in zones]
+        citations = sorted({self.idle_limits[zone][1] for zone in zones})
+        return RegulationAnswer("idle_limit", "\n".join(lines), citations)
+
+    def _answer_co2(self, q: str) -> Optional[RegulationAnswer]:
+        classes = self._match_classes(q) or list(self.co2_limits)
+        lines = [
+            "**CO₂ emission limits by vehicle class:**\n",
+            "| Vehicle Class | Unloaded (g/km) | Loaded (g/km) |",
+            "|---------------|-----------------|---------------|",
+        ]
+        for label in classes:
+            limits = self.co2_limits[label]
+            lines.append(f"| {label} | {limits['unloaded']:.0f} | {limits['loaded']:.0f} |")
+        citations = sorted({self.co2_limits[label]["citation"] for label in classes})
+        return RegulationAnswer("co2_limit", "\n".join(lines), citations)
+
+    def _answer_penalty(self, q: str) -> Optional[RegulationAnswer]:
+        q = q.replace("idling", "idle")
+        matched = [
+            v for v in self.penalties
+            if any(re.search(rf"\b{re.escape(word)}", q) for word in v.lower().split() if word not in self._GENERIC_WORDS)
+        ]
+        violations = matched or list(self.penalties)
+        idle = bool(self.idle_offenses) and (re.search(r"\bidle\b", q) is not None or not matched)
+
+        lines, citations = [], set()
+        if violations:
+            lines += [
+                "**Green Zone penalties:**\n",
+                "| Violation | First Offense | Repeat Offense |",
+                "|-----------|---------------|----------------|",
+            ]
+            lines += [
+                f"| {v} | {self.penalties[v]['first']} | {self.penalties[v]['repeat']} |"
+                for v in violations
+            ]
+            citations |= {self.penalties[v]["citation"] for v in violations}
+
+        if idle:
+            lines.append("\n**BS-VI idle violations (Class B):**\n")
+            lines += [f"- {key}: {value}" for key, value in self.idle_offenses]
+            citations.add(self.idle_offense_citation)
+
+        return RegulationAnswer("penalty", "\n".join(lines), sorted(citations))
+
+    def _answer_formula(self, q: str) -> Optional[RegulationAnswer]:
+        formula = self.load_formula
+        lines = ["**Load adjustment formula:**\n", "```", formula["text"], "```"]
+
+        load = self._LOAD_RE.search(q)
+        if load:
+            # The documented formula is for HCVs only: the load term is added
+            # to the unloaded HCV base (the "loaded" column already includes it)
+            hcv = [c for c in self.co2_limits if c.lower().startswith("hcv")]
+            classes = self._match_classes(q)
+            if not hcv or any(c not in hcv for c in classes):
+                return None
+            if not classes and not self._FORMULA_RE.search(q):
+                return None
+            label = hcv[0]
+            base = self.co2_limits[label]["unloaded"]
+            amount = float(load.group(1).replace(",", ""))
+            load_kg = amount if load.group(2).startswith("k") else amount * 1000
+            adjusted = base + load_kg / formula["per_kg"] * formula["g_per_km"]
+            lines.append(
+                f"\nFor a {label} carrying {load_kg:,.0f} kg: "
+                f"{base:.0f} + ({load_kg:,.0f} / {formula['per_kg']:.0f}) × {formula['g_per_km']:.0f} "
+                f"= **{adjusted:,.0f} g CO₂/km**"
+            )
+        return RegulationAnswer("load_formula", "\n".join(lines), [formula["citation"]])
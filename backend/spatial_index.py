@@ -0,0 +1,84 @@
+"""
+PathGreen-AI: Spatial Index
+
+Uniform lat/lng grid over current vehicle positions.
+Rebuilt once per tick and shared by every scoped /ws subscription, so a
+viewport query only touches the cells it overlaps instead of the whole fleet.
+"""
+
+import math
+from typing import Iterable
+
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+# ~1.1 km cells at Bangalore's latitude; a city viewport spans tens of cells
+DEFAULT_CELL_SIZE_DEG = 0.01
+
+
+class GridIndex:
+    """
+    Bucket vehicles into fixed-size lat/lng cells.
+
+    Bounding-box queries scan only the overlapping cells and do an exact
+    containment test on the boundary ones.
+    """
+
+    def __init__(self, vehicles: Iterable[dict] = (), cell_size_deg: float = DEFAULT_CELL_SIZE_DEG):
+        self.cell_size = cell_size_deg
+        self.cells: dict[tuple[int, int], list[dict]] = {}
+        self.by_id: dict[str, dict] = {}
+        for vehicle in vehicles:
+            self.insert(vehicle)
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    def _cell(self, lat: float, lng: float) -> tuple[int, int]:
+        return (math.floor(lat / self.cell_size), math.floor(lng / self.cell_size))
+
+    def insert(self, vehicle: dict):
+        """Add a vehicle dict (needs "id", "lat" and "lng")."""
+        self.by_id[vehicle["id"]] = vehicle
+        self.cells.setdefault(self._cell(vehicle["lat"], vehicle["lng"]), []).append(vehicle)
+
+    def query_bbox(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> list[dict]:
+        """
+        Vehicles inside a bounding box (inclusive).
+
+        Args:
+            min_lat, min_lng: South-west corner
+            max_lat, max_lng: North-east corner
+
+        Returns:
+            Matching vehicle dicts
+        """
+        lo_x, lo_y = self._cell(min_lat, min_lng)
+        hi_x, hi_y = self._cell(max_lat, max_lng)
+        span = (hi_x - lo_x + 1) * (hi_y - lo_y + 1)
+
+        # Zoomed far out: walking occupied cells is cheaper than walking the box
+        if span > len(self.cells):
+            candidates = (
+                cell for (x, y), cell in self.cells.items()
+                if lo_x <= x <= hi_x and lo_y <= y <= hi_y
+            )
+        else:
+            candidates = (
+                self.cells[(x, y)]
+                for x in range(lo_x, hi_x + 1)
+                for y in range(lo_y, hi_y + 1)
+                if (x, y) in self.cells
+            )
+
+        return [
+            v for cell in candidates for v in cell
+            if min_lat <= v["lat"] <= max_lat and min_lng <= v["lng"] <= max_lng
+        ]
+
+    def query_ids(self, vehicle_ids: Iterable[str]) -> list[dict]:
+        """Vehicles with the given ids, skipping unknown ones."""
+        by_id = self.by_id
+        return [by_id[vid] for vid in vehicle_ids if vid in by_id]
@@ -0,0 +1,233 @@
+"""
+PathGreen-AI: Fleet State Store
+
+In-process, versioned latest-state-per-vehicle store.
+
+Writers (the Pathway subscribe callback or the simulator tick) publish whole
+batches; each batch produces a new immutable FleetSnapshot which replaces the
+old one with a single reference assignment. Readers (/fleet, /ws, /chat)
+just grab `store.snapshot` and never take a lock.
+"""
+
+import itertools
+import json
+import secrets
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Iterable, Optional
+
+
+def _dumps(payload: dict) -> bytes:
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+class FleetSnapshot:
+    """
+    Immutable view of the fleet at one version.
+
+    Attributes:
+        version: Monotonically increasing batch number (0 = empty store)
+        vehicles: vehicle_id -> latest vehicle dict
+        changed_at: vehicle_id -> version at which it last changed
+        source: "pathway" or "simulator"
+    """
+
+    __slots__ = (
+        "epoch", "version", "vehicles", "changed_at", "source", "created_at",
+        "_list", "_body", "_since_bodies",
+    )
+
+    def __init__(self, epoch: str, version: int, vehicles: dict, changed_at: dict, source: str):
+        self.epoch = epoch
+        self.version = version
+        self.vehicles = vehicles
+        self.changed_at = changed_at
+        self.source = source
+        self.created_at = time.time()
+        self._list: Optional[list[dict]] = None
+        self._body: Optional[bytes] = None
+        self._since_bodies: dict[int, bytes] = {}
+
+    @property
+    def vehicle_list(self) -> list[dict]:
+        """Vehicles as a list in first-seen order (memoized)."""
+        if self._list is None:
+            self._list = list(self.vehicles.values())
+        return self._list
+
+    @property
+    def etag(self) -> str:
+        """Strong ETag; the epoch keeps versions from a previous process distinct."""
+        return f'"{self.epoch}-{self.version}"'
+
+    def to_json(self) -> bytes:
+        """Full GET /fleet body for this version (serialized once)."""
+        if self._body is None:
+            self._body = _dumps({
+                "data": self.vehicle_list,
+                "source": self.source,
+                "version": self.version,
+                "full": True,
+            })
+        return self._body
+
+    def changes_since_json(self, since_version: int) -> bytes:
+        """
+        GET /fleet body with only vehicles changed after `since_version`.
+
+        A `since_version` ahead of this snapshot can only come from a client
+        of an earlier process, so it gets the full body instead.
+        """
+        if since_version > self.version or since_version < 0:
+            return self.to_json()
+
+        body = self._since_bodies.get(since_version)
+        if body is None:
+            changed_at = self.changed_at
+            changed = [v for vid, v in self.vehicles.items() if changed_at[vid] > since_version]
+            body = _dumps({
+                "data": changed,
+                "source": self.source,
+                "version": self.version,
+                "since_version": since_version,
+                "full": False,
+            })
+            # Bounded: only a handful of distinct since values are polled per version
+            if len(self._since_bodies) < 16:
+                self._since_bodies[since_version] = body
+        return body
+
+
+class FleetStateStore:
+    """
+    Copy-on-write store of the latest state of every vehicle.
+
+    Only writers serialize on a lock; reads are a plain attribute access
+    of an immutable snapshot, which is atomic under the GIL.
+    """
+
+    def __init__(self, source: str = "simulator", max_pending_alerts: int = 1000):
+        self.epoch = secrets.token_hex(4)
+        self._snapshot = FleetSnapshot(self.epoch, 0, {}, {}, source)
+        self._write_lock = threading.Lock()
+        self._alerts: deque[dict] = deque(maxlen=max_pending_alerts)
+        self._alert_seq = itertools.count(1)
+
+    @property
+    def snapshot(self) -> FleetSnapshot:
+        """Current snapshot (lock-free)."""
+        return self._snapshot
+
+    def apply(self, updates: Iterable[dict], alerts: Iterable[dict] = (), source: Optional[str] = None) -> FleetSnapshot:
+        """
+        Publish a batch of vehicle updates as a new version.
+
+        Args:
+            updates: Vehicle dicts keyed by their "id"; treated as immutable
+            alerts: Alerts raised by this batch, queued for the broadcaster;
+                each is given an "alert_id" unique across restarts
+            source: Override the snapshot source label
+
+        Returns:
+            The new snapshot
+        """
+        with self._write_lock:
+            current = self._snapshot
+            version = current.version + 1
+            vehicles = dict(current.vehicles)
+            changed_at = dict(current.changed_at)
+
+            for vehicle in updates:
+                vehicles[vehicle["id"]] = vehicle
+                changed_at[vehicle["id"]] = version
+
+            self._snapshot = FleetSnapshot(self.epoch, version, vehicles, changed_at, source or current.source)
+            for alert in alerts:
+                alert.setdefault("alert_id", f"{self.epoch}-{next(self._alert_seq)}")
+                self._alerts.append(alert)
+            return self._snapshot
+
+    def drain_alerts(self) -> list[dict]:
+        """Pop all alerts queued since the last call."""
+        drained = []
+        while self._alerts:
+            try:
+                drained.append(self._alerts.popleft())
+            except IndexError:
+                break
+        return drained
+
+
+class PathwayFleetFeed:
+    """
+    Bridge from the Pathway emissions table to a FleetStateStore.
+
+    Plugged into `pw.io.subscribe`: rows are collected per Pathway time by
+    `on_change` and committed as one store version in `on_time_end`, so a
+    minibatch costs one copy-on-write regardless of how many rows it holds.
+    Alerts are raised only when a vehicle's alert type or severity changes,
+    not on every row while the condition persists.
+    """
+
+    def __init__(self, store: FleetStateStore):
+        self.store = store
+        self._pending: dict[str, dict] = {}
+        self._alerts: list[dict] = []
+        self._alert_state: dict[str, tuple] = {}
+
+    def on_change(self, key, row: dict, time: int, is_addition: bool):
+        """pw.io.subscribe row callback."""
+        if not is_addition:
+            return
+
+        vid = row["vehicle_id"]
+        pending = self._pending.get(vid)
+        if pending is not None and pending["_ts"] > row["timestamp"]:
+            return
+
+        speed = row["speed_kmh"]
+        severity = row.get("alert_severity") or "INFO"
+        if severity in ("WARNING", "CRITICAL"):
+            status = severity
+        else:
+            status = "IDLE" if speed < 1.0 else "MOVING"
+
+        vehicle = {
+            "id": vid,
+            "lat": row["latitude"],
+            "lng": row["longitude"],
+            "status": status,
+            "co2": round(row.get("co2_rate_g_per_km") or row.get("co2_grams") or 0),
+            "speed": speed,
+            "idle_seconds": row.get("idle_seconds", 0),
+            "_ts": row["timestamp"],
+        }
+        self._pending[vid] = vehicle
+
+        alert_state = (row.get("alert_type"), severity)
+        if alert_state != self._alert_state.get(vid):
+            self._alert_state[vid] = alert_state
+            if alert_state[0]:
+                self._alerts.append({
+                    "vehicle_id": vid,
+                    "type": alert_state[0],
+                    "severity": severity,
+                    "message": f"Extended idle: {int(vehicle['idle_seconds'])}s",
+                    "lat": vehicle["lat"],
+                    "lng": vehicle["lng"],
+                    "timestamp": datetime.fromtimestamp(row["timestamp"] / 1000).isoformat(),
+                })
+
+    def on_time_end(self, time: int):
+        """pw.io.subscribe end-of-minibatch callback: commit one version."""
+        if not self._pending:
+            return
+        updates = []
+        for vehicle in self._pending.values():
+            vehicle.pop("_ts", None)
+            updates.append(vehicle)
+        self.store.apply(updates, self._alerts, source="pathway")
+        self._pending = {}
+        self._alerts = []
@@ -0,0 +1,102 @@
+"""
+PathGreen-AI: Alert Explainer Tests
+
+An unchanged alert condition (same vehicle, type and severity) must cost
+one background LLM call, however many ticks re-raise it.
+
+Run (from backend/):
+    python -m pytest tests
+"""
+
+import asyncio
+import re
+import sys
+from itertools import count
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from alert_explainer import AlertExplainer  # noqa: E402
+
+_IDS = count(1)
+
+
+def make_alert(vehicle_id: str = "TRK-104", severity: str = "WARNING") -> dict:
+    return {
+        "alert_id": f"e-{next(_IDS)}",
+        "vehicle_id": vehicle_id,
+        "type": "HIGH_IDLE",
+        "severity": severity,
+        "message": f"{vehicle_id} idling",
+    }
+
+
+class FakeLLM:
+    """Answers every alert id in the prompt; can be told to fail."""
+
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+
+    async def generate(self, prompt: str) -> str:
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("backend down")
+        ids = re.findall(r"^(e-\d+) \|", prompt, re.MULTILINE)
+        return "\n".join(f"{alert_id}: explained" for alert_id in ids)
+
+
+def run_windows(explainer: AlertExplainer, windows: list[list[dict]]):
+    async def scenario():
+        for alerts in windows:
+            explainer.submit(alerts)
+            await explainer.flush()
+    asyncio.run(scenario())
+
+
+def test_repeated_alerts_across_windows_make_one_call():
+    llm = FakeLLM()
+    explainer = AlertExplainer(generate=llm.generate)
+    windows = [[make_alert(), make_alert()] for _ in range(10)]
+
+    run_windows(explainer, windows)
+
+    assert llm.calls == 1
+    assert all(explainer.get(a["alert_id"])["source"] == "llm" for w in windows for a in w)
+    assert explainer.latest_for("TRK-104")["explanation"] == "explained"
+
+
+def test_repeats_while_pending_wait_for_the_same_call():
+    llm = FakeLLM()
+    explainer = AlertExplainer(generate=llm.generate)
+    first, second = make_alert(), make_alert()
+
+    explainer.submit([first])
+    explainer.submit([second])
+    asyncio.run(explainer.flush())
+
+    assert llm.calls == 1
+    assert explainer.get(second["alert_id"])["source"] == "llm"
+
+
+def test_changed_severity_is_explained_again():
+    llm = FakeLLM()
+    explainer = AlertExplainer(generate=llm.generate)
+
+    run_windows(explainer, [[make_alert()], [make_alert()], [make_alert(severity="CRITICAL")], [make_alert(severity="CRITICAL")]])
+
+    assert llm.calls == 2
+
+
+def test_failed_call_is_retried_by_the_next_alert():
+    llm = FakeLLM()
+    llm.fail = True
+    explainer = AlertExplainer(generate=llm.generate)
+    run_windows(explainer, [[make_alert()]])
+
+    llm.fail = False
+    retry = make_alert()
+    run_windows(explainer, [[retry], [make_alert()]])
+
+    assert llm.calls == 2
+    assert explainer.get(retry["alert_id"])["source"] == "llm"
@@ -0,0 +1,69 @@
+"""
+PathGreen-AI: Broadcast Hub Tests
+
+SUBSCRIBE scopes come straight from clients; a malformed one must be
+rejected, and a view that fails to build must not stop the others.
+
+Run (from backend/):
+    python -m pytest tests
+"""
+
+import asyncio
+import math
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from broadcast import BroadcastHub, parse_scope  # noqa: E402
+
+VEHICLES = [
+    {"id": "TRK-101", "lat": 12.97, "lng": 77.59, "co2": 120.0, "status": "MOVING"},
+    {"id": "TRK-102", "lat": 13.02, "lng": 77.64, "co2": 80.0, "status": "IDLE"},
+]
+
+
+class FakeWebSocket:
+    client = None
+
+
+@pytest.mark.parametrize("bbox", [
+    [math.nan, 77.0, 13.0, 78.0],
+    [12.0, 77.0, math.inf, 78.0],
+    [-math.inf, 77.0, 13.0, 78.0],
+    [12.0, "east", 13.0, 78.0],
+])
+def test_non_finite_bbox_is_rejected(bbox):
+    with pytest.raises(ValueError):
+        parse_scope({"type": "SUBSCRIBE", "bbox": bbox})
+
+
+def test_bbox_is_clamped_to_valid_coordinates():
+    assert parse_scope({"bbox": [-100, -200, 100, 200]}) == ("bbox", (-90.0, -180.0, 90.0, 180.0))
+
+
+def test_broken_view_does_not_stop_other_views():
+    async def scenario():
+        hub = BroadcastHub()
+        healthy = hub.new_subscriber(FakeWebSocket())
+        broken = hub.new_subscriber(FakeWebSocket())
+        hub.subscribe(healthy)
+        hub.subscribe(broken)
+        hub.set_scope(healthy, parse_scope({"bbox": [12.9, 77.5, 13.1, 77.7]}))
+        # Bypasses parse_scope, as an unvalidated scope would
+        hub.set_scope(broken, ("bbox", (math.nan, 77.0, 13.0, 78.0)))
+
+        # Sender tasks haven't run yet, so queued frames are still visible
+        hub.publish(VEHICLES, [], engine="simulator")
+        queued = healthy.stats()["queued"], broken.stats()["queued"]
+        healthy.stop()
+        broken.stop()
+        return hub, queued
+
+    hub, (healthy_queued, broken_queued) = asyncio.run(scenario())
+    assert hub.view_errors == 1
+    assert hub.frames_published == 1
+    assert healthy_queued == 1
+    assert broken_queued == 0
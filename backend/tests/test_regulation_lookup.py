@@ -0,0 +1,78 @@
+"""
+PathGreen-AI: Regulation Lookup Tests
+
+The fast path answers plain questions about the regulation tables (a
+generic one gets the whole table); questions about anything the tables
+don't cover have to reach the LLM.
+
+Run (from backend/):
+    python -m pytest tests
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from regulation_lookup import RegulationIndex  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def regulations() -> RegulationIndex:
+    return RegulationIndex.load()
+
+
+@pytest.mark.parametrize("query", [
+    "emission limits for electric vehicles",
+    "fine for not having PUC certificate",
+    "max emissions allowed in Delhi?",
+    "Is 2 tonnes of load allowed?",
+    "Explain the maximum idle time and the reasons behind it",
+    "How do idle limits relate to CO2 limits for HCV?",
+])
+def test_unspecific_questions_fall_through(regulations, query):
+    assert regulations.answer(query) is None
+
+
+@pytest.mark.parametrize("query, intent, expected", [
+    ("What is the idle limit in a metro zone?", "idle_limit", "Metro Zones"),
+    ("CO2 limit for HCV", "co2_limit", "HCV (>12t)"),
+    ("What's the penalty for an emission spike?", "penalty", "Emission Spike"),
+    ("penalty for idling", "penalty", "Second offense"),
+    ("load adjustment for an HCV carrying 12 tonnes", "load_formula", "12,000 kg"),
+    ("what is the load adjustment formula?", "load_formula", "Load adjustment formula"),
+    ("What are the BS-VI idle limits?", "idle_limit", "Loading/Unloading Zones"),
+    ("idle limits per zone", "idle_limit", "Highway Rest Areas"),
+    ("co2 limits", "co2_limit", "MCV (3.5-12t)"),
+    ("What are the penalties?", "penalty", "No Permit"),
+])
+def test_specific_lookups_are_answered(regulations, query, intent, expected):
+    answer = regulations.answer(query)
+    assert answer is not None
+    assert answer.intent == intent
+    assert expected in answer.text
+    assert answer.citations
+
+
+def test_idle_answer_lists_only_the_named_zone(regulations):
+    answer = regulations.answer("How long can a truck idle in a green zone?")
+    assert "Green Zone" in answer.text
+    assert "Metro Zones" not in answer.text
+
+
+def test_generic_questions_get_the_whole_table(regulations):
+    answer = regulations.answer("What are the BS-VI idle limits?")
+    assert all(zone in answer.text for zone in regulations.idle_limits)
+
+
+def test_load_formula_uses_the_unloaded_hcv_base(regulations):
+    base = regulations.co2_limits["HCV (>12t)"]["unloaded"]
+    answer = regulations.answer("emission limit for hcv loaded with 5 t")
+    assert answer.intent == "load_formula"
+    assert f"= **{base + 5 * 25:,.0f} g CO₂/km**" in answer.text
+
+
+def test_load_formula_is_hcv_only(regulations):
+    assert regulations.answer("adjusted limit for an LCV carrying 2 tonnes") is None
@@ -205,6 +205,7 @@ def compute_emissions(vehicle_state: pw.Table) -> pw.Table:
         pw.this.latitude,
         pw.this.longitude,
         pw.this.speed_kmh,
+        pw.this.idle_seconds,
         # Emission calculation (simplified inline)
         co2_grams=pw.if_else(
             pw.this.speed_kmh < 1.0,
@@ -0,0 +1,388 @@
+"""
+PathGreen-AI: Local Vector Index
+
+Offline semantic retrieval for regulation chunks.
+
+- HashingEmbedder: hashed word + character n-gram features projected into a
+  fixed-size, L2-normalized float32 vector. No model download, no API key,
+  deterministic across processes.
+- VectorIndex: IVF (inverted file) index. Vectors are clustered with
+  spherical k-means and stored contiguously per cluster, so a query scores
+  the centroids and then only the rows of the few closest clusters, with
+  one matrix product per probed cluster (a contiguous slice, no copy).
+
+Indexes are saved as .npy files and memory-mapped on load, so startup
+reads no vectors until queries touch them and nothing is recomputed while
+the chunk fingerprint and embedder model still match.
+"""
+
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import shutil
+import zlib
+from pathlib import Path
+from typing import Callable, Iterable, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+DEFAULT_DIM = 384
+DEFAULT_CHAR_NGRAMS = (3, 4)
+DEFAULT_N_PROBE = 8
+KMEANS_ITERATIONS = 8
+REBUILD_ITERATIONS = 2  # refinement rounds when warm-started from previous centroids
+WORD_CACHE_SIZE = 50000  # memoized per-word feature vectors
+
+# Below this many vectors a flat scan beats clustering
+MIN_VECTORS_FOR_IVF = 256
+
+INDEX_FORMAT_VERSION = 1
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _default_tokenize(text: str) -> list[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def chunk_fingerprint(chunks: Iterable[tuple[str, str]]) -> str:
+    """Digest of (chunk id, content) pairs; a saved index is reused only if it matches."""
+    digest = hashlib.sha256()
+    for chunk_id, content in chunks:
+        digest.update(chunk_id.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(content.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+# =============================================================================
+# EMBEDDER
+# =============================================================================
+
+class HashingEmbedder:
+    """
+    Feature-hashing text embedder.
+
+    Each word maps to its own hashed features plus its character n-grams
+    ("idle" and "idling" share "idl"), CRC32-hashed into `dim` signed
+    buckets and memoized per word. A text is the sum of its word vectors
+    weighted by log term frequency, L2-normalized, so a dot product is
+    cosine similarity.
+
+    Args:
+        dim: Output dimensionality
+        char_ngrams: (min, max) character n-gram sizes (0 = words only)
+        tokenize: Text -> words (defaults to lowercase alphanumeric runs)
+    """
+
+    def __init__(
+        self,
+        dim: int = DEFAULT_DIM,
+        char_ngrams: tuple[int, int] = DEFAULT_CHAR_NGRAMS,
+        tokenize: Optional[Callable[[str], list[str]]] = None,
+    ):
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("numpy is required for the local embedder")
+        self.dim = dim
+        self.char_ngrams = char_ngrams
+        self.tokenize = tokenize or _default_tokenize
+        self.model_name = f"hashed-ngram-v1-d{dim}-c{char_ngrams[0]}{char_ngrams[1]}"
+        self._word_cache: dict[str, tuple] = {}
+
+    def _word_vector(self, word: str) -> tuple["np.ndarray", "np.ndarray"]:
+        """Sparse (buckets, signed weights) for one word and its n-grams, memoized."""
+        cached = self._word_cache.get(word)
+        if cached is not None:
+            return cached
+
+        features = {"w:" + word: 2.0}  # the word outweighs the n-grams it expands to
+        low, high = self.char_ngrams
+        if low:
+            padded = f"#{word}#"
+            for n in range(low, high + 1):
+                for i in range(len(padded) - n + 1):
+                    gram = "c:" + padded[i:i + n]
+                    features[gram] = features.get(gram, 0.0) + 0.5
+
+        buckets = np.empty(len(features), dtype=np.int64)
+        weights = np.empty(len(features), dtype=np.float32)
+        for j, (feature, weight) in enumerate(features.items()):
+            h = zlib.crc32(feature.encode("utf-8"))
+            buckets[j] = h % self.dim
+            weights[j] = weight if h & 0x80000000 else -weight
+
+        if len(self._word_cache) >= WORD_CACHE_SIZE:
+            self._word_cache.clear()
+        self._word_cache[word] = (buckets, weights)
+        return buckets, weights
+
+    def embed(self, texts: Sequence[str]) -> "np.ndarray":
+        """
+        Embed a batch of texts.
+
+        Returns:
+            (len(texts), dim) float32 array of unit vectors (zero rows for
+            texts without any word)
+        """
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts: dict[str, int] = {}
+            for word in self.tokenize(text):
+                counts[word] = counts.get(word, 0) + 1
+            target = matrix[row]
+            for word, count in counts.items():
+                buckets, weights = self._word_vector(word)
+                np.add.at(target, buckets, weights * (1.0 + math.log(count)))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+
+# =============================================================================
+# IVF INDEX
+# =============================================================================
+
+class VectorIndex:
+    """
+    Inverted-file index over unit vectors (cosine similarity).
+
+    Rows are stored grouped by cluster: cluster c owns rows
+    offsets[c]:offsets[c + 1], and ids maps each row back to the caller's
+    item number (e.g. chunk position).
+
+    Build with `VectorIndex.build()` or `VectorIndex.load()`.
+    """
+
+    def __init__(self, vectors, centroids, offsets, ids, model_name: str, fingerprint: str = ""):
+        self.vectors = vectors
+        self.centroids = centroids
+        self.offsets = offsets
+        self.ids = ids
+        self.model_name = model_name
+        self.fingerprint = fingerprint
+
+    @property
+    def size(self) -> int:
+        return int(self.vectors.shape[0])
+
+    @property
+    def n_lists(self) -> int:
+        return int(self.centroids.shape[0])
+
+    # -------------------------------------------------------------------------
+    # Build
+    # -------------------------------------------------------------------------
+
+    @classmethod
+    def build(
+        cls,
+        vectors: "np.ndarray",
+        model_name: str,
+        fingerprint: str = "",
+        n_lists: Optional[int] = None,
+        iterations: int = KMEANS_ITERATIONS,
+        seed: int = 0,
+        centroids: Optional["np.ndarray"] = None,
+    ) -> "VectorIndex":
+        """
+        Cluster `vectors` and lay them out by cluster.
+
+        Args:
+            vectors: (n, dim) unit vectors; row i is item i
+            model_name: Embedder that produced them
+            fingerprint: Digest of the embedded content (see chunk_fingerprint)
+            n_lists: Cluster count (default ~sqrt(n); 1 for small inputs)
+            iterations: Spherical k-means iterations
+            seed: RNG seed for centroid initialization
+            centroids: Starting centroids instead of a random init (sets n_lists)
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        n = vectors.shape[0]
+        if centroids is not None and 1 < len(centroids) <= n:
+            centroids = np.array(centroids, dtype=np.float32)
+            n_lists = centroids.shape[0]
+        else:
+            centroids = None
+        if n_lists is None:
+            n_lists = 1 if n < MIN_VECTORS_FOR_IVF else int(math.sqrt(n))
+        n_lists = max(1, min(n_lists, n))
+
+        if n_lists == 1:
+            centroids = vectors.mean(axis=0, keepdims=True) if n else np.zeros((1, vectors.shape[1]), np.float32)
+            assignment = np.zeros(n, dtype=np.int64)
+        else:
+            if centroids is None:
+                rng = np.random.default_rng(seed)
+                centroids = vectors[rng.choice(n, n_lists, replace=False)].copy()
+            for _ in range(iterations):
+                assignment = np.argmax(vectors @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assignment, vectors)
+                norms = np.linalg.norm(sums, axis=1, keepdims=True)
+                # Empty clusters keep their previous centroid
+                centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids).astype(np.float32)
+            assignment = np.argmax(vectors @ centroids.T, axis=1)
+
+        order = np.argsort(assignment, kind="stable")
+        counts = np.bincount(assignment, minlength=n_lists)
+        offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        return cls(vectors[order], centroids.astype(np.float32), offsets, order.astype(np.int64), model_name, fingerprint)
+
+    def rebuild(self, vectors: "np.ndarray", fingerprint: str = "") -> "VectorIndex":
+        """
+        Index a changed corpus embedded by the same model.
+
+        k-means is warm-started from this index's centroids and only refined
+        for REBUILD_ITERATIONS, unless the corpus grew or shrank enough that
+        the cluster count no longer fits.
+        """
+        n = len(vectors)
+        target = 1 if n < MIN_VECTORS_FOR_IVF else int(math.sqrt(n))
+        if target == 1 or not (target / 2 <= self.n_lists <= target * 2):
+            return VectorIndex.build(vectors, self.model_name, fingerprint)
+        return VectorIndex.build(
+            vectors, self.model_name, fingerprint, iterations=REBUILD_ITERATIONS, centroids=self.centroids
+        )
+
+    # -------------------------------------------------------------------------
+    # Query
+    # -------------------------------------------------------------------------
+
+    def search(
+        self,
+        queries: "np.ndarray",
+        top_k: int = 3,
+        n_probe: int = DEFAULT_N_PROBE,
+    ) -> list[list[tuple[int, float]]]:
+        """
+        Nearest items for a batch of query vectors.
+
+        Args:
+            queries: (q, dim) or (dim,) unit vectors
+            top_k: Results per query
+            n_probe: Closest clusters scanned per query
+
+        Returns:
+            Per query, [(item id, cosine similarity)] best first; items with
+            non-positive similarity are dropped
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if self.size == 0:
+            return [[] for _ in range(len(queries))]
+
+        n_probe = min(n_probe, self.n_lists)
+        if n_probe == self.n_lists:
+            probes = np.broadcast_to(np.arange(self.n_lists), (len(queries), self.n_lists))
+        else:
+            centroid_scores = queries @ self.centroids.T
+            probes = np.argpartition(-centroid_scores, n_probe - 1, axis=1)[:, :n_probe]
+
+        results = []
+        offsets, vectors = self.offsets, self.vectors
+        for query, lists in zip(queries, probes):
+            # Each probed cluster is a contiguous slice: score it in place,
+            # without gathering rows into a copy
+            starts = [int(offsets[c]) for c in lists]
+            parts = [vectors[start:int(offsets[c + 1])] @ query for start, c in zip(starts, lists)]
+            scores = np.concatenate(parts) if parts else np.empty(0, np.float32)
+            if scores.size == 0:
+                results.append([])
+                continue
+            rows = np.concatenate([np.arange(start, start + len(part)) for start, part in zip(starts, parts)])
+            k = min(top_k, scores.size)
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best])]
+            results.append([
+                (int(self.ids[rows[b]]), float(scores[b])) for b in best if scores[b] > 0
+            ])
+        return results
+
+    # -------------------------------------------------------------------------
+    # Persistence
+    # -------------------------------------------------------------------------
+
+    def save(self, directory) -> None:
+        """
+        Write the index to `directory` (replaced as a whole).
+
+        Files are written to a sibling temp directory first, so a crash
+        never leaves a half-written index behind.
+        """
+        directory = Path(directory)
+        tmp = directory.with_name(directory.name + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+
+        np.save(tmp / "vectors.npy", np.asarray(self.vectors, dtype=np.float32))
+        np.save(tmp / "centroids.npy", self.centroids)
+        np.save(tmp / "offsets.npy", self.offsets)
+        np.save(tmp / "ids.npy", self.ids)
+        (tmp / "meta.json").write_text(json.dumps({
+            "version": INDEX_FORMAT_VERSION,
+            "model": self.model_name,
+            "fingerprint": self.fingerprint,
+            "size": self.size,
+            "dim": int(self.centroids.shape[1]),
+            "n_lists": self.n_lists,
+        }))
+
+        old = directory.with_name(directory.name + ".old")
+        shutil.rmtree(old, ignore_errors=True)
+        if directory.exists():
+            os.replace(directory, old)
+        os.replace(tmp, directory)
+        shutil.rmtree(old, ignore_errors=True)
+
+    @classmethod
+    def load(
+        cls,
+        directory,
+        model_name: Optional[str] = None,
+        fingerprint: Optional[str] = None,
+    ) -> Optional["VectorIndex"]:
+        """
+        Memory-map a saved index.
+
+        Returns:
+            The index, or None if missing, unreadable, or built by another
+            model / from other content than expected
+        """
+        directory = Path(directory)
+        try:
+            meta = json.loads((directory / "meta.json").read_text())
+        except (OSError, ValueError):
+            return None
+        if meta.get("version") != INDEX_FORMAT_VERSION:
+            return None
+        if model_name is not None and meta.get("model") != model_name:
+            return None
+        if fingerprint is not None and meta.get("fingerprint") != fingerprint:
+            return None
+        try:
+            return cls(
+                np.load(directory / "vectors.npy", mmap_mode="r"),
+                np.load(directory / "centroids.npy"),
+                np.load(directory / "offsets.npy"),
+                np.load(directory / "ids.npy"),
+                meta["model"],
+                meta.get("fingerprint", ""),
+            )
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"[VectorIndex] Could not load {directory}: {e}")
+            return None